@@ -1,7 +1,17 @@
+import os
+import sys
 from numpy.random import binomial
 from numpy.random import uniform
-from numpy import ones_like
+from numpy import array
 import matplotlib.pyplot as plt
+from stopping import simulate_stopping_times
+from stopping import stopping_time_pmf
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+from thinkbayes import MakePmfFromHist
+from thinkbayes import QuantileSketch
+from thinkbayes import StreamingHist
 
 jar1_h = 0.55
 jar2_h = 0.56
@@ -22,40 +32,44 @@ def pickAJar():
   print "Picked Jar 2"
   return jar2
 
-def main():
+def main(exact=False):
+  """ Runs the experiment; with exact, also computes the exact mean number of
+  trials, which takes several seconds for jars as close as these
+  """
   # pick a jar randomly
   jar = pickAJar()
+  jar_h = jar1_h if jar is jar1 else jar2_h
 
   # start with a random prior
   eps = 0.00001
   prior_jar1 = uniform(0+2*eps, 1-2*eps)
-  prior_jar2 = 1 - prior_jar1
-  num_trials = []
-
-  # Perform the same experiment for a given prior 1000 times to find number of trials needed
-  for x in xrange(10000):
-    p_jar1 = prior_jar1
-    p_jar2 = prior_jar2
-    trials = 0
-
-    # perform trials till one of the probability fall below eps
-    while(p_jar1 > eps and p_jar2 > eps):
-      trials += 1
-      outcome = jar()
-      if outcome == 1:
-        p_h = jar1_h * p_jar1 + jar2_h * p_jar2
-        p_jar1 = (jar1_h * p_jar1) / p_h
-      if outcome == 0:
-        p_t = (1-jar1_h) * p_jar1 + (1-jar2_h) * p_jar2
-        p_jar1 = (((1-jar1_h) * p_jar1) / p_t)
-
-      p_jar2 = 1 - p_jar1
-
-    num_trials.append(trials)
+
+  # Perform the same experiment for a given prior 10000 times to find number
+  # of trials needed, till one of the probabilities falls below eps. The
+  # replicates run in blocks and are counted into a histogram with at most
+  # 100 bins and a quantile sketch, so memory does not grow with their number
+  hist = StreamingHist(max_bins=100)
+  sketch = QuantileSketch()
+  for _ in xrange(10):
+    num_trials = simulate_stopping_times(jar_h, jar1_h, jar2_h, prior_jar1,
+                                         eps, 1000)
+    hist.IncrArray(num_trials)
+    sketch.IncrArray(num_trials)
+  print "Mean number of trials (to within half a bin):", \
+      MakePmfFromHist(hist).Mean()
+  cdf = sketch.MakeCdf()
+  print "Median and 90% interval:", cdf.Percentile(50), \
+      cdf.CredibleInterval(90)
+  if exact:
+    print "Exact expectation:", stopping_time_pmf(jar_h, jar1_h, jar2_h,
+                                                  prior_jar1, eps).Mean()
 
   # Print a distribution chart
-  count, bins, ignored = plt.hist(num_trials, 100, normed=True)
+  xs, freqs = hist.Render()
+  # xs are the midpoints of the bins
+  density = array(freqs) / (hist.width * hist.Total())
+  plt.bar(xs, density, hist.width, align='center')
   plt.show()
 
 if __name__ == '__main__':
-  main()
+  main(exact='--exact' in sys.argv[1:])
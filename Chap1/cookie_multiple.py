@@ -3,6 +3,7 @@ from numpy.random import uniform
 from numpy.random import random_integers
 from numpy import ones_like
 import matplotlib.pyplot as plt
+from trajectories import posterior_trajectories
 
 def main():
   # Define 5 coins. Each coin is represented by the parameter p
@@ -18,31 +19,20 @@ def main():
   priors = [0.0, 0.50, 0.50, 0.0]
 
   print "Chosen Coins:"
-  heads = 0
-  total = 0
 
   # Perform some trials
-  for x in xrange(10):
-    # Choose a coin and flip it
-    # coin_num = random_integers(0, len(chosen_coins)-1)
-    # coin_result = binomial(1, chosen_coins[coin_num])
-    coin_result = binomial(1, 0.45)
-
-    # Get posteriors
-    if coin_result == 1:
-      temp = [a*b for (a,b) in zip(coins, priors)]
-    else:
-      temp = [a*b for (a,b) in zip([1-j for j in coins], priors)]
-
-    # Check coins :P
-    if coin_result == 1:
-      heads += 1
-    total += 1
-
-    p_h = sum(temp)
-    temp = [a/p_h for a in temp]
-    priors = temp
-    print coin_result, priors
+  # Choose a coin and flip it
+  # coin_num = random_integers(0, len(chosen_coins)-1)
+  # coin_result = binomial(1, chosen_coins[coin_num])
+  flips = binomial(1, 0.45, (1, 10))
+
+  # Get posteriors after every flip
+  trajectory = posterior_trajectories(flips, coins, priors)[0]
+  for (coin_result, posterior) in zip(flips[0], trajectory):
+    print coin_result, list(posterior)
+  priors = list(trajectory[-1])
+  heads = flips.sum()
+  total = flips.size
 
   print priors
   print coins
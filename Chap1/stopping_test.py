@@ -0,0 +1,111 @@
+"""
+Test file for stopping.py
+"""
+import random
+import unittest
+import numpy
+from stopping import simulate_stopping_times
+from stopping import stopping_time_cdf
+from stopping import stopping_time_pmf
+from stopping import stopping_time_probabilities
+
+def stopping_time(jar_h, jar1_h, jar2_h, prior_jar1, eps):
+  """ Runs one replicate of the experiment with scalar Bayes updates
+  """
+  p_jar1 = prior_jar1
+  trials = 0
+  while eps < p_jar1 < 1 - eps:
+    trials += 1
+    if random.random() < jar_h:
+      p_jar1 = jar1_h * p_jar1 / (jar1_h * p_jar1 + jar2_h * (1 - p_jar1))
+    else:
+      p_jar1 = ((1 - jar1_h) * p_jar1 /
+                ((1 - jar1_h) * p_jar1 + (1 - jar2_h) * (1 - p_jar1)))
+  return trials
+
+def stopping_time_dp(jar_h, jar1_h, jar2_h, prior_jar1, eps, draws):
+  """ Computes P(stop after n draws) for n < draws, one draw at a time
+  """
+  up = numpy.log(jar1_h / jar2_h)
+  down = numpy.log((1 - jar1_h) / (1 - jar2_h))
+  high = numpy.log((1 - eps) / eps)
+  start = numpy.log(prior_jar1) - numpy.log1p(-prior_jar1)
+  alive = {0: 1.0}
+  ps = [0.0] * draws
+  for n in xrange(1, draws):
+    following = {}
+    for (h, p) in alive.iteritems():
+      for (dh, q) in ((1, jar_h), (0, 1 - jar_h)):
+        odds = start + (h + dh) * up + (n - h - dh) * down
+        if -high < odds < high:
+          following[h + dh] = following.get(h + dh, 0) + p * q
+        else:
+          ps[n] += p * q
+    alive = following
+  return ps
+
+class StoppingTest(unittest.TestCase):
+
+  def test_simulate_stopping_times(self):
+    random.seed(1)
+    args = (0.7, 0.7, 0.5, 0.3, 0.001)
+    expected = numpy.array([stopping_time(*args) for _ in xrange(5000)])
+    times = simulate_stopping_times(*args, replicates=20000, rng=2)
+    self.assertEqual(len(times), 20000)
+    self.assertTrue(times.min() >= 1)
+    # The means agree to within a few standard errors
+    se = (expected.var() / len(expected) + times.var() / len(times)) ** 0.5
+    self.assertTrue(abs(times.mean() - expected.mean()) < 4 * se)
+
+    # The same seed gives the same sample
+    self.assertTrue(numpy.array_equal(
+        times, simulate_stopping_times(*args, replicates=20000, rng=2)))
+
+    # Without an rng, numpy.random.seed makes the sample reproducible
+    numpy.random.seed(5)
+    times = simulate_stopping_times(*args, replicates=100)
+    numpy.random.seed(5)
+    self.assertTrue(numpy.array_equal(
+        times, simulate_stopping_times(*args, replicates=100)))
+
+  def test_stopping_time_pmf(self):
+    # The second case has ties: the bounds are exactly two heads away
+    for args in [(0.7, 0.7, 0.5, 0.3, 0.001), (0.2, 0.7, 0.6, 0.6, 0.01),
+                 (0.5, 2 / 3.0, 1 / 3.0, 0.5, 0.2)]:
+      expected = stopping_time_dp(*(args + (300,)))
+      pmf = stopping_time_pmf(*args, tol=1e-16)
+      for n in xrange(300):
+        self.assertAlmostEqual(pmf.Prob(n), expected[n], places=12)
+      self.assertAlmostEqual(pmf.Total(), 1, places=10)
+
+    jar1, jar2 = stopping_time_probabilities(0.7, 0.7, 0.5, 0.3, 0.001)
+    self.assertTrue(jar1.sum() > 0.99)
+    # Rejecting the true jar is about as likely as eps times the prior odds
+    self.assertTrue(0 < jar2.sum() < 0.001 * 0.7 / 0.3)
+
+    # The exact mean agrees with the simulation
+    args = (0.7, 0.7, 0.5, 0.3, 0.001)
+    times = simulate_stopping_times(*args, replicates=20000, rng=3)
+    se = (times.var() / len(times)) ** 0.5
+    self.assertTrue(abs(times.mean() - stopping_time_pmf(*args).Mean()) <
+                    4 * se)
+
+    cdf = stopping_time_cdf(*args)
+    self.assertEqual(cdf.Value(1), max(cdf.xs))
+    self.assertEqual(stopping_time_pmf(0.5, 0.6, 0.4, 0.9999, 0.01).Items(),
+                     [(0, 1.0)])
+
+  def test_prior_outside_bounds(self):
+    times = simulate_stopping_times(0.5, 0.6, 0.4, [0.0001, 0.5, 0.9999], 0.01,
+                                    replicates=3, rng=0)
+    self.assertEqual(times[0], 0)
+    self.assertTrue(times[1] > 0)
+    self.assertEqual(times[2], 0)
+
+  def test_equal_jars(self):
+    self.assertRaises(ValueError, simulate_stopping_times, 0.5, 0.5, 0.5, 0.5,
+                      0.01)
+
+
+if __name__ == "__main__":
+  unittest.main()
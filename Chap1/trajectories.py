@@ -0,0 +1,136 @@
+"""Posteriors over coin biases for many flip sequences at once.
+
+The hypotheses are candidate biases of a coin, and the data are sequences of
+flips, 1 for a head and 0 for a tail. After k flips with h heads, the log
+likelihood of bias c is h log(c) + (k - h) log(1 - c), so the posteriors
+after every flip of every sequence follow from the cumulative number of
+heads, with one cumsum and one broadcast over the hypotheses.
+"""
+
+import os
+import sys
+
+import numpy
+import scipy.special
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+import thinkbayes
+
+
+def simulate_flips(p, sequences, flips, rng=None):
+  """ Simulates coin flips
+  Args:
+    p: probability of a head, a scalar or an array that broadcasts to
+      (sequences, flips), like one bias per sequence as a column
+    sequences: number of sequences
+    flips: number of flips per sequence
+    rng: numpy RandomState, or a seed for one; by default the global
+      numpy.random generator
+  Returns:
+    A (sequences, flips) array of int8, 1 for a head and 0 for a tail
+  """
+  if rng is None:
+    rng = numpy.random
+  elif not isinstance(rng, numpy.random.RandomState):
+    rng = numpy.random.RandomState(rng)
+  return (rng.random_sample((sequences, flips)) < p).astype(numpy.int8)
+
+
+def _posteriors(heads, tails, coins, priors):
+  """ Computes normalized posteriors, broadcasting the counts against the
+  hypotheses along a new last axis
+  """
+  coins = numpy.asarray(coins, dtype=float)
+  heads = numpy.asarray(heads)[..., None]
+  tails = numpy.asarray(tails)[..., None]
+  with numpy.errstate(divide='ignore'):
+    log_priors = numpy.log(numpy.asarray(priors, dtype=float))
+  if numpy.all((0 < coins) & (coins < 1)):
+    logs = heads * numpy.log(coins) + tails * numpy.log1p(-coins)
+  else:
+    # xlogy makes 0 log 0 = 0, for biases of 0 and 1
+    logs = (scipy.special.xlogy(heads, coins) +
+            scipy.special.xlog1py(tails, -coins))
+  logs += log_priors
+  logs -= logs.max(axis=-1)[..., None]
+  numpy.exp(logs, out=logs)
+  logs /= logs.sum(axis=-1)[..., None]
+  return logs
+
+
+def posterior_trajectories(flips, coins, priors=None, final_only=False):
+  """ Computes the posterior over the coins after every flip of every
+  sequence.
+
+  If the data are impossible under every hypothesis with a positive prior,
+  the posteriors of that sequence are nan from then on.
+
+  Args:
+    flips: (sequences, flips) array of 0 and 1, or one sequence
+    coins: sequence of H candidate probabilities of a head
+    priors: sequence of H prior probabilities, uniform if omitted; they need
+      not be normalized
+    final_only: whether to compute only the posteriors after the last flip,
+      which takes memory proportional to sequences * H rather than
+      sequences * flips * H
+  Returns:
+    (sequences, flips, H) array whose [i, k] entry is the posterior after the
+    first k + 1 flips of sequence i, or (sequences, H) array with final_only
+  """
+  flips = numpy.atleast_2d(flips)
+  if priors is None:
+    priors = numpy.ones(len(coins))
+  if final_only:
+    heads = flips.sum(axis=1)
+    tails = flips.shape[1] - heads
+    with numpy.errstate(invalid='ignore'):
+      return _posteriors(heads, tails, coins, priors)
+
+  # Work through the sequences in blocks, so that the temporaries stay small
+  # next to the result
+  (sequences, length) = flips.shape
+  result = numpy.empty((sequences, length, len(coins)))
+  block = max(1, (1 << 20) // max(1, length * len(coins)))
+  for start in xrange(0, sequences, block):
+    heads = numpy.cumsum(flips[start:start + block], axis=1)
+    tails = numpy.arange(1, length + 1) - heads
+    with numpy.errstate(invalid='ignore'):
+      result[start:start + block] = _posteriors(heads, tails, coins, priors)
+  return result
+
+
+class CoinSuite(thinkbayes.Suite):
+  """ Hypotheses about the probability that a coin lands heads; the data are
+  1 for a head and 0 for a tail.
+  """
+
+  def Likelihood(self, data, hypo):
+    """ Computes the likelihood of a flip given the bias hypo
+    """
+    return hypo if data else 1 - hypo
+
+
+def make_suite(posterior, coins, name=''):
+  """ Converts a posterior over coins into a Suite
+  Args:
+    posterior: sequence of H probabilities, like one row of the result of
+      posterior_trajectories
+    coins: sequence of H probabilities of a head
+    name: string name for the suite
+  Returns:
+    CoinSuite
+  """
+  suite = CoinSuite(name=name)
+  for (coin, p) in zip(coins, numpy.asarray(posterior).tolist()):
+    suite.Incr(coin, p)
+  return suite
+
+
+def make_suites(posteriors, coins, name=''):
+  """ Converts an array of posteriors, with the hypotheses on the last axis,
+  into a list of Suites, flattening the other axes
+  """
+  posteriors = numpy.asarray(posteriors)
+  return [make_suite(p, coins, name)
+          for p in posteriors.reshape(-1, posteriors.shape[-1])]
@@ -0,0 +1,68 @@
+"""
+Test file for trajectories.py
+"""
+import unittest
+import numpy
+from trajectories import make_suite
+from trajectories import make_suites
+from trajectories import posterior_trajectories
+from trajectories import simulate_flips
+
+def update(priors, coins, coin_result):
+  """ Updates the priors with one flip, as cookie_multiple.py does
+  """
+  if coin_result == 1:
+    temp = [a*b for (a,b) in zip(coins, priors)]
+  else:
+    temp = [a*b for (a,b) in zip([1-j for j in coins], priors)]
+  p_h = sum(temp)
+  return [a/p_h for a in temp]
+
+class TrajectoriesTest(unittest.TestCase):
+
+  def test_posterior_trajectories(self):
+    coins = [0.05, 0.25, 0.65, 0.85]
+    priors = [0.1, 0.4, 0.3, 0.2]
+    flips = simulate_flips(numpy.array([[0.3], [0.7], [0.5]]), 3, 40, rng=1)
+    result = posterior_trajectories(flips, coins, priors)
+    self.assertEqual(result.shape, (3, 40, 4))
+    for (i, sequence) in enumerate(flips):
+      posterior = priors
+      for (k, flip) in enumerate(sequence):
+        posterior = update(posterior, coins, flip)
+        for (x, y) in zip(result[i, k], posterior):
+          self.assertAlmostEqual(x, y)
+
+    final = posterior_trajectories(flips, coins, priors, final_only=True)
+    self.assertEqual(final.shape, (3, 4))
+    self.assertTrue(numpy.allclose(final, result[:, -1]))
+
+    # Without an rng, numpy.random.seed makes the flips reproducible
+    numpy.random.seed(3)
+    flips = simulate_flips(0.5, 4, 20)
+    numpy.random.seed(3)
+    self.assertTrue(numpy.array_equal(flips, simulate_flips(0.5, 4, 20)))
+
+  def test_degenerate_coins(self):
+    result = posterior_trajectories([1, 1, 0], [0, 0.5, 1])
+    self.assertTrue(numpy.allclose(result[0, 1], [0, 0.2, 0.8]))
+    self.assertTrue(numpy.allclose(result[0, 2], [0, 1, 0]))
+    # Impossible data under every hypothesis with a positive prior
+    self.assertTrue(numpy.isnan(posterior_trajectories([0], [0.5, 1],
+                                                       [0, 1])).all())
+
+  def test_make_suite(self):
+    coins = [0.25, 0.5, 0.75]
+    flips = [1, 0, 1, 1]
+    result = posterior_trajectories(flips, coins)
+    suite = make_suite(result[0, 2], coins)
+    suite.Update(flips[3])
+    for (coin, p) in zip(coins, result[0, 3]):
+      self.assertAlmostEqual(suite.Prob(coin), p)
+    suites = make_suites(result, coins)
+    self.assertEqual(len(suites), 4)
+    self.assertAlmostEqual(suites[0].Prob(0.75), 0.5)
+
+
+if __name__ == "__main__":
+  unittest.main()
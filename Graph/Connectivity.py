@@ -0,0 +1,184 @@
+"""Monte Carlo estimates of the probability that G(n, p) is connected.
+
+Sweeps a grid of (n, p) and, for each cell, counts how many of R random
+graphs are connected. Replicates never build Graph objects: each one samples
+an edge list with sample_gnp_edges and checks connectivity with an integer
+union-find. Replicates are spread over a process pool; replicate r of cell
+(i, j) always draws from numpy.random.RandomState([seed, i, j, r]), so the
+results do not depend on the number of processes.
+
+The counts are turned into Beta posteriors over P(connected), using
+thinkbayes.
+"""
+
+import multiprocessing
+import os
+import sys
+
+import numpy
+import scipy.stats
+
+from Graph import sample_gnp_edges
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+import thinkbayes
+
+
+def edges_connected(n, v, w):
+  """ Determines if a graph given as an edge list is connected
+  Args:
+    n: number of vertices, labeled 0..n-1
+    v, w: arrays of endpoints, one entry per edge
+  Returns:
+    true if the graph is connected, false otherwise
+  """
+  if n <= 1:
+    return True
+  if len(v) < n - 1:
+    return False
+  # Near the connectivity threshold, most disconnected graphs have an
+  # isolated vertex, which is cheap to detect
+  degrees = numpy.bincount(v, minlength=n) + numpy.bincount(w, minlength=n)
+  if not degrees.all():
+    return False
+
+  parent = range(n)
+  components = n
+  for (x, y) in zip(v.tolist(), w.tolist()):
+    while parent[x] != x:
+      parent[x] = parent[parent[x]]
+      x = parent[x]
+    while parent[y] != y:
+      parent[y] = parent[parent[y]]
+      y = parent[y]
+    if x != y:
+      parent[y] = x
+      components -= 1
+      if components == 1:
+        return True
+  return components == 1
+
+
+def gnp_connected(n, p, rng=None):
+  """ Samples G(n, p) and determines if it is connected
+  Args:
+    n: number of vertices
+    p: probability that an edge is present
+    rng: numpy RandomState, or a seed for one
+  """
+  v, w = sample_gnp_edges(n, p, rng)
+  return edges_connected(n, v, w)
+
+
+def _count_connected(task):
+  """ Counts the connected graphs among a block of replicates of one cell
+  Args:
+    task: tuple of (i, j, n, p, seed, start, stop)
+  Returns:
+    tuple of (i, j, count)
+  """
+  (i, j, n, p, seed, start, stop) = task
+  count = 0
+  for r in xrange(start, stop):
+    rng = numpy.random.RandomState([seed, i, j, r])
+    count += gnp_connected(n, p, rng)
+  return (i, j, count)
+
+
+class ConnectivityResults(object):
+  """ Results of a connectivity experiment.
+
+  Attributes:
+    ns: array of vertex counts, one per row
+    ps: array of edge probabilities, one per column
+    replicates: number of graphs sampled per cell
+    connected: array of the number of connected graphs in each cell
+  """
+
+  def __init__(self, ns, ps, replicates, connected):
+    self.ns = ns
+    self.ps = ps
+    self.replicates = replicates
+    self.connected = connected
+
+  def probabilities(self):
+    """ Returns the fraction of connected graphs in each cell
+    """
+    return self.connected / float(self.replicates)
+
+  def beta(self, i, j, alpha=1, beta=1):
+    """ Returns the posterior of P(connected) for cell (i, j)
+    Args:
+      alpha, beta: parameters of the Beta prior
+    Returns:
+      thinkbayes.Beta
+    """
+    k = int(self.connected[i, j])
+    name = 'n=%d, p=%g' % (self.ns[i], self.ps[j])
+    return thinkbayes.Beta(alpha + k, beta + self.replicates - k, name=name)
+
+  def pmf(self, i, j, steps=101):
+    """ Returns a discrete approximation to the posterior for cell (i, j)
+    """
+    return self.beta(i, j).MakePmf(steps=steps)
+
+  def credible_intervals(self, percentage=90, alpha=1, beta=1):
+    """ Computes central credible intervals for every cell
+    Args:
+      percentage: float between 0 and 100
+      alpha, beta: parameters of the Beta prior
+    Returns:
+      tuple of arrays (low, high)
+    """
+    tail = (1 - percentage / 100.0) / 2
+    a = alpha + self.connected
+    b = beta + self.replicates - self.connected
+    return (scipy.stats.beta.ppf(tail, a, b),
+            scipy.stats.beta.ppf(1 - tail, a, b))
+
+
+def connectivity_experiment(ns, ps, replicates, seed=0, processes=None,
+                            block=None):
+  """ Estimates P(G(n, p) is connected) over a grid of n and p
+  Args:
+    ns: sequence of vertex counts
+    ps: sequence of edge probabilities
+    replicates: number of graphs to sample per cell
+    seed: int seed; the same seed gives the same results
+    processes: size of the process pool; 1 runs in this process, and None
+      uses every CPU
+    block: replicates per task, chosen automatically if omitted
+  Returns:
+    ConnectivityResults
+  """
+  ns = numpy.asarray(ns, dtype=numpy.int64)
+  ps = numpy.asarray(ps, dtype=float)
+  if processes is None:
+    processes = multiprocessing.cpu_count()
+  if block is None:
+    block = max(1, replicates // (8 * processes))
+
+  tasks = [(i, j, int(n), float(p), seed, start,
+            min(start + block, replicates))
+           for (i, n) in enumerate(ns)
+           for (j, p) in enumerate(ps)
+           for start in xrange(0, replicates, block)]
+
+  connected = numpy.zeros((len(ns), len(ps)), numpy.int64)
+  if processes == 1:
+    results = map(_count_connected, tasks)
+  else:
+    pool = multiprocessing.Pool(processes)
+    try:
+      results = list(pool.imap_unordered(_count_connected, tasks))
+      pool.close()
+    except BaseException:
+      # Stop the remaining tasks rather than wait for them
+      pool.terminate()
+      raise
+    finally:
+      pool.join()
+  for (i, j, count) in results:
+    connected[i, j] += count
+  return ConnectivityResults(ns, ps, replicates, connected)
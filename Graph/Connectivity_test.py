@@ -0,0 +1,57 @@
+"""
+Test file for Connectivity.py
+"""
+import time
+import unittest
+import numpy
+from Connectivity import connectivity_experiment
+from Connectivity import edges_connected
+from Connectivity import gnp_connected
+
+class ConnectivityTest(unittest.TestCase):
+
+  def test_edges_connected(self):
+    path_v = numpy.array([1, 2, 3])
+    path_w = numpy.array([0, 1, 2])
+    self.assertTrue(edges_connected(4, path_v, path_w))
+    self.assertFalse(edges_connected(5, path_v, path_w))
+    self.assertTrue(edges_connected(1, path_v[:0], path_w[:0]))
+
+    # Two triangles: no isolated vertex, but two components
+    v = numpy.array([1, 2, 2, 4, 5, 5])
+    w = numpy.array([0, 0, 1, 3, 3, 4])
+    self.assertFalse(edges_connected(6, v, w))
+
+  def test_gnp_connected(self):
+    self.assertTrue(gnp_connected(20, 1.0))
+    self.assertFalse(gnp_connected(20, 0.0))
+
+  def test_connectivity_experiment(self):
+    ns = [10, 40]
+    ps = [0.0, 0.2, 1.0]
+    results = connectivity_experiment(ns, ps, 20, seed=3, processes=1)
+    self.assertEqual(results.connected.shape, (2, 3))
+    self.assertEqual(list(results.connected[:, 0]), [0, 0])
+    self.assertEqual(list(results.connected[:, 2]), [20, 20])
+
+    # Results do not depend on the pool size or the block size
+    pooled = connectivity_experiment(ns, ps, 20, seed=3, processes=2,
+                                     block=3)
+    self.assertEqual(pooled.connected.tolist(), results.connected.tolist())
+
+    low, high = results.credible_intervals(90)
+    means = (results.connected + 1) / 22.0
+    self.assertTrue((low <= means).all() and (means <= high).all())
+    self.assertEqual(results.probabilities()[0, 2], 1.0)
+    self.assertAlmostEqual(results.beta(1, 2).Mean(), 21 / 22.0)
+
+  def test_connectivity_experiment_error(self):
+    # A failing task stops the pool instead of waiting for the slow ones
+    start = time.time()
+    self.assertRaises(ValueError, connectivity_experiment, [3000], [2.0, 0.5],
+                      10, processes=2, block=1)
+    self.assertTrue(time.time() - start < 5)
+
+
+if __name__ == "__main__":
+  unittest.main()
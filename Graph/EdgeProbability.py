@@ -0,0 +1,123 @@
+"""Bayesian estimation of the edge probability p of G(n, p) from graphs.
+
+Under G(n, p), the likelihood of a graph with n vertices and m edges is
+p^m (1-p)^(N-m), where N = n(n-1)/2 is the number of vertex pairs. So a graph
+reduces to the sufficient statistics (N, m), and any number of graphs reduces
+to the sums of their statistics; the cost of an update does not depend on the
+number of edges.
+
+The posterior can be kept as a conjugate thinkbayes.Beta, or as a grid Suite
+over p (EdgeProbabilitySuite) when the prior is not a Beta.
+"""
+
+import collections
+import os
+import sys
+
+import numpy
+import scipy.special
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+import thinkbayes
+
+
+"""Sufficient statistics of a graph for p.
+
+Attributes:
+  vertices: number of vertices n
+  pairs: number of vertex pairs n(n-1)/2
+  edges: number of edges m
+  degrees: Hist of vertex degrees, or None if it was not requested
+"""
+GraphStatistics = collections.namedtuple(
+    'GraphStatistics', ['vertices', 'pairs', 'edges', 'degrees'])
+
+
+def graph_statistics(g, degrees=False):
+  """ Reduces a graph to its sufficient statistics for p
+  Args:
+    g: Graph or FrozenGraph
+    degrees: whether to also compute the degree histogram, which is not
+      needed for p but is useful to check the fit of the G(n, p) model
+  Returns:
+    GraphStatistics
+  """
+  n = len(g)
+  hist = g.degree_hist() if degrees else None
+  return GraphStatistics(n, n * (n - 1) // 2, g.num_edges(), hist)
+
+
+def _totals(graphs):
+  """ Sums the statistics of a sequence of graphs
+  Args:
+    graphs: sequence of Graph, FrozenGraph or GraphStatistics
+  Returns:
+    tuple of (pairs, edges)
+  """
+  pairs = 0
+  edges = 0
+  for g in graphs:
+    if not isinstance(g, GraphStatistics):
+      g = graph_statistics(g)
+    pairs += g.pairs
+    edges += g.edges
+  return pairs, edges
+
+
+def update_beta(beta, graphs):
+  """ Updates a Beta distribution over p with a batch of graphs
+  Args:
+    beta: thinkbayes.Beta, modified in place
+    graphs: sequence of Graph, FrozenGraph or GraphStatistics
+  Returns:
+    beta
+  """
+  pairs, edges = _totals(graphs)
+  beta.Update((edges, pairs - edges))
+  return beta
+
+
+class EdgeProbabilitySuite(thinkbayes.Suite):
+  """ A grid of hypotheses about p.
+
+  The data for Likelihood is a GraphStatistics; UpdateGraphs updates with a
+  whole batch of graphs in one vectorized step.
+  """
+
+  def Likelihood(self, data, hypo):
+    """ Computes the likelihood of the graph statistics data given p=hypo
+    """
+    return numpy.exp(self.LogLikelihood(data, hypo))
+
+  def LogLikelihood(self, data, hypo):
+    """ Computes the log likelihood of the graph statistics data given p=hypo
+    """
+    return (scipy.special.xlogy(data.edges, hypo) +
+            scipy.special.xlog1py(data.pairs - data.edges, -hypo))
+
+  def UpdateGraphs(self, graphs):
+    """ Updates every hypothesis with a batch of graphs
+    Args:
+      graphs: sequence of Graph, FrozenGraph or GraphStatistics
+    Returns:
+      the normalizing constant, relative to the largest likelihood
+    """
+    pairs, edges = _totals(graphs)
+    hypos = self.Values()
+    loglikes = self.LogLikelihood(GraphStatistics(None, pairs, edges, None),
+                                  numpy.array(hypos, dtype=float))
+    likes = numpy.exp(loglikes - loglikes.max())
+    for (hypo, like) in zip(hypos, likes):
+      self.Mult(hypo, like)
+    return self.Normalize()
+
+
+def make_edge_probability_suite(steps=1001, name='p'):
+  """ Makes a suite with a uniform prior over p on an evenly spaced grid
+  """
+  suite = EdgeProbabilitySuite(name=name)
+  for p in numpy.linspace(0, 1, steps):
+    suite.Set(p, 1)
+  suite.Normalize()
+  return suite
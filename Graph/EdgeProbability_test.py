@@ -0,0 +1,59 @@
+"""
+Test file for EdgeProbability.py
+"""
+import unittest
+from EdgeProbability import graph_statistics
+from EdgeProbability import make_edge_probability_suite
+from EdgeProbability import update_beta
+from Graph import Edge
+from Graph import Graph
+from Graph import RandomGraph
+from Graph import Vertex
+import thinkbayes
+
+class EdgeProbabilityTest(unittest.TestCase):
+
+  def test_graph_statistics(self):
+    v = Vertex('v')
+    w = Vertex('w')
+    x = Vertex('x')
+    g = Graph([v,w,x], [Edge(v,w)])
+
+    stats = graph_statistics(g, degrees=True)
+    self.assertEqual(stats.vertices, 3)
+    self.assertEqual(stats.pairs, 3)
+    self.assertEqual(stats.edges, 1)
+    self.assertEqual(stats.degrees.GetDict(), {0: 1, 1: 2})
+    frozen = graph_statistics(g.freeze(), degrees=True)
+    self.assertEqual(frozen[:3], stats[:3])
+    self.assertEqual(frozen.degrees.GetDict(), stats.degrees.GetDict())
+    self.assertEqual(graph_statistics(Graph()).pairs, 0)
+
+  def test_update_beta(self):
+    graphs = [RandomGraph(30, 0.1, seed=i) for i in range(5)]
+    beta = update_beta(thinkbayes.Beta(), graphs)
+    edges = sum(g.num_edges() for g in graphs)
+    self.assertEqual(beta.alpha, 1 + edges)
+    self.assertEqual(beta.beta, 1 + 5 * 435 - edges)
+    self.assertTrue(abs(beta.Mean() - 0.1) < 0.03)
+
+  def test_suite(self):
+    graphs = [graph_statistics(RandomGraph(30, 0.1, seed=i))
+              for i in range(5)]
+    suite = make_edge_probability_suite(steps=101)
+    suite.UpdateGraphs(graphs)
+
+    # The grid posterior agrees with the conjugate one
+    beta = update_beta(thinkbayes.Beta(), graphs)
+    self.assertAlmostEqual(suite.Mean(), beta.Mean(), places=3)
+
+    # Updating one graph at a time gives the same answer
+    other = make_edge_probability_suite(steps=101)
+    for stats in graphs:
+      other.UpdateGraphs([stats])
+    self.assertAlmostEqual(other.Mean(), suite.Mean())
+    self.assertEqual(suite.Prob(0.0), 0)
+
+
+if __name__ == "__main__":
+  unittest.main()
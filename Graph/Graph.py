@@ -17,47 +17,88 @@ http://greenteapress.com/complexity/thinkcomplexity.pdf
 from sets import Set
 from collections import deque
 from numpy.random import binomial
-import hashlib
 import logging
+import os
+import sys
+import numpy
+import scipy.sparse
+import scipy.sparse.csgraph
 
-"""A hash function
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                             os.pardir))
+import thinkbayes
+
+_MASK64 = (1 << 64) - 1
+
+"""Scrambles a hash into 64 bits (the splitmix64 finalizer), so that sums of
+scrambled hashes rarely collide.
 """
-def hash_string(s):
-  return int(hashlib.md5(s).hexdigest(), 16)
+def mix_hash(h):
+  h = (h + 0x9E3779B97F4A7C15) & _MASK64
+  h = ((h ^ (h >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+  h = ((h ^ (h >> 27)) * 0x94D049BB133111EB) & _MASK64
+  return h ^ (h >> 31)
+
+# Separates edge contributions to a graph fingerprint from vertex ones
+_EDGE_SALT = 0x5BD1E995
 
 """
 A class representing a vertex. It has a label.
+Vertices are hashed on every dictionary lookup in the graph, so the hash is
+computed once, at construction, from the representation of the label. Two
+vertices are equal if their labels have the same representation.
 """
-class Vertex:
+class Vertex(object):
+  __slots__ = ('label', '_hash')
+
   def __init__ (self, label):
     """ Creates a new vertex.
 
+    The label must not be changed once the vertex is created, as the hash is
+    derived from it.
+
     Args:
       label: Label of the vertex to be created
     """
     self.label = label
+    self._hash = hash(repr(label))
 
   def __repr__(self):
     """ Crete a string representation of the vertex
     """
-    return '%s' % repr(self.label)
+    return repr(self.label)
 
   __str__ = __repr__
 
   def __eq__(self, other):
+    if self is other:
+      return True
+    if isinstance(other, Vertex):
+      return (self._hash == other._hash and
+              repr(self.label) == repr(other.label))
     return self.__str__() == other.__str__()
 
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
   def __hash__(self):
-    return hash_string(self.__str__())
+    return self._hash
+
+  def __reduce__(self):
+    return (Vertex, (self.label,))
 
 
 """ A class representing an edge.
 It inherits from Tuple, and hence the objects created are immutable.
 When a new object is created, first __new__ is called, followed by __init__.
 Thus we have overridden __new__ in this instead of __init__.
+The hash of an edge is the tuple hash, which combines the cached hashes of
+its vertices.
 """
 
 class Edge(tuple):
+  __slots__ = ()
+
   def __new__ (self, v1, v2):
     """ Creates a new undirected edge.
 
@@ -69,6 +110,9 @@ class Edge(tuple):
       return tuple.__new__(self, (v1, v2))
     return tuple.__new__(self, (v2, v1))
 
+  def __getnewargs__(self):
+    return tuple(self)
+
   def __repr__(self):
     """ Crete a string representation of the edge
     """
@@ -77,13 +121,175 @@ class Edge(tuple):
   __str__ = __repr__
 
   def __eq__(self, other):
+    if self is other:
+      return True
+    if isinstance(other, Edge):
+      return tuple.__eq__(self, other)
     return self.__str__() == other.__str__()
 
-  def __hash__(self):
-    return hash_string(self.__str__())
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
+  __hash__ = tuple.__hash__
+
+
+def _report_anomalies(operation, anomalies):
+  """ Logs one warning that summarizes the anomalies of a bulk operation
+  """
+  if anomalies:
+    logging.warning('%s: %s', operation,
+                    ', '.join('%d %s' % (count, kind)
+                              for (kind, count) in sorted(anomalies.items())))
+
+
+class DisjointSet(object):
+  """ A union-find structure over hashable items, with path compression and
+  union by rank, so any sequence of operations takes nearly constant amortized
+  time per operation.
+  """
+
+  def __init__(self, items=[]):
+    """ Creates a disjoint set with every item in a set of its own
+    """
+    self.parent = {}
+    self.rank = {}
+    self.count = 0
+    for x in items:
+      self.add(x)
+
+  def __len__(self):
+    return len(self.parent)
+
+  def __contains__(self, x):
+    return x in self.parent
+
+  def add(self, x):
+    """ Adds x in a set of its own, unless it is already present
+    """
+    if x not in self.parent:
+      self.parent[x] = x
+      self.rank[x] = 0
+      self.count += 1
+
+  def find(self, x):
+    """ Returns the representative of the set containing x
+    """
+    parent = self.parent
+    while parent[x] is not x:
+      # Path halving: point every other node at its grandparent
+      parent[x] = parent[parent[x]]
+      x = parent[x]
+    return x
+
+  def union(self, x, y):
+    """ Merges the sets containing x and y
+    Returns:
+      True if they were different sets, False otherwise
+    """
+    x = self.find(x)
+    y = self.find(y)
+    if x is y:
+      return False
+    if self.rank[x] < self.rank[y]:
+      x, y = y, x
+    self.parent[y] = x
+    if self.rank[x] == self.rank[y]:
+      self.rank[x] += 1
+    self.count -= 1
+    return True
+
+  def same(self, x, y):
+    """ Determines if x and y are in the same set
+    """
+    return self.find(x) is self.find(y)
+
+
+# Bulk constructors for each kind of thinkbayes distribution
+_MAKERS = {
+    'hist': thinkbayes.MakeHistFromArray,
+    'pmf': thinkbayes.MakePmfFromArray,
+    'cdf': thinkbayes.MakeCdfFromArray,
+}
+
+
+class GraphDistributions(object):
+  """ Builds thinkbayes distributions of graph statistics in bulk.
+
+  Subclasses provide degrees(), component_sizes() and distance_array(start),
+  each returning the sample as a sequence or numpy array; the sample is
+  counted with one numpy.unique instead of one Incr per value.
+  """
+
+  def _distribution(self, values, kind, name):
+    return _MAKERS[kind](numpy.asarray(values, numpy.int64), name=name)
+
+  def degree_hist(self, name='degrees'):
+    """ Returns a Hist of the vertex degrees
+    """
+    return self._distribution(self.degrees(), 'hist', name)
+
+  def degree_pmf(self, name='degrees'):
+    """ Returns a Pmf of the degree of a uniformly chosen vertex
+    """
+    return self._distribution(self.degrees(), 'pmf', name)
+
+  def degree_cdf(self, name='degrees'):
+    """ Returns a Cdf of the degree of a uniformly chosen vertex
+    """
+    return self._distribution(self.degrees(), 'cdf', name)
+
+  def component_size_hist(self, name='component sizes'):
+    """ Returns a Hist of the sizes of the connected components
+    """
+    return self._distribution(self.component_sizes(), 'hist', name)
+
+  def component_size_pmf(self, name='component sizes'):
+    """ Returns a Pmf of the size of a uniformly chosen component
+    """
+    return self._distribution(self.component_sizes(), 'pmf', name)
+
+  def component_size_cdf(self, name='component sizes'):
+    """ Returns a Cdf of the size of a uniformly chosen component
+    """
+    return self._distribution(self.component_sizes(), 'cdf', name)
+
+  def distance_hist(self, start, name='distances'):
+    """ Returns a Hist of the bfs distances from start to the vertices it
+    reaches, including start itself at distance 0
+    """
+    return self._distribution(self.distance_array(start), 'hist', name)
+
+  def distance_pmf(self, start, name='distances'):
+    """ Returns a Pmf of the distance from start to a uniformly chosen vertex
+    that it reaches
+    """
+    return self._distribution(self.distance_array(start), 'pmf', name)
+
+  def distance_cdf(self, start, name='distances'):
+    """ Returns a Cdf of the distance from start to a uniformly chosen vertex
+    that it reaches
+    """
+    return self._distribution(self.distance_array(start), 'cdf', name)
 
 
-class Graph(dict):
+class Graph(dict, GraphDistributions):
+  """ An undirected graph.
+
+  Besides the adjacency dictionaries, the graph keeps the set of its edges up
+  to date as edges are added and removed, so counting and listing edges does
+  not scan the adjacency lists. The degree of a vertex is the size of its
+  adjacency dictionary. This only holds if the graph is modified through its
+  methods rather than by assigning to the dictionaries directly.
+
+  Optionally (see track_components) the graph also maintains a DisjointSet of
+  its vertices, which answers connectivity queries in nearly constant time
+  while edges are only being added.
+
+  The fingerprint of the graph is the sum, modulo 2^64, of a scrambled hash of
+  every vertex and every edge. It does not depend on insertion order and is
+  updated as the graph changes, so hashing a graph is O(1) and comparing two
+  graphs with different fingerprints is O(1).
+  """
   def __init__ (self, vs = [], es = []):
     """Create a new graph.
 
@@ -91,11 +297,13 @@ class Graph(dict):
       vs: list of vertices
       es: list of edges
     """
-    for v in vs:
-      self.add_vertex(v)
+    self.edge_set = set()
+    self.union_find = None
+    self.union_find_stale = False
+    self.fingerprint = 0
 
-    for e in es:
-      self.add_edge(e)
+    self.add_vertices_from(vs)
+    self.add_edges_from(es)
 
   def add_vertex(self, v) :
     """ Adds a vertex to the Graph's vertices.
@@ -108,9 +316,18 @@ class Graph(dict):
     #this vertex.
     if v in self:
       logging.warning('Vertex not inserted as there is another vertex in graph'
-                      + ' with label ' + v.label)
+                      ' with label %s', v)
       return
+    self._insert(v)
+
+  def _insert(self, v):
+    """ Adds the vertex v, which must not be in the graph. Every method that
+    adds vertices goes through here.
+    """
     self[v] = {}
+    self.fingerprint = (self.fingerprint + mix_hash(hash(v))) & _MASK64
+    if self.union_find is not None:
+      self.union_find.add(v)
 
   def add_edge(self, e):
     """ Adds an edge to the set of vertices.
@@ -120,18 +337,144 @@ class Graph(dict):
     """
     (v,w) = e
     if not self.has_key(v):
-      logging.warning('Attempt to insert edge ' + str(e) + ' while vertex ' +
-                      str(v) + ' is not in graph yet. This resulted in '+
-                      'addition of ' + str(v) + ' to the graph.')
+      logging.warning('Attempt to insert edge %s while vertex %s is not in '
+                      'graph yet. This resulted in addition of %s to the '
+                      'graph.', e, v, v)
       self.add_vertex(v)
     if not self.has_key(w):
-      logging.warning('Attempt to insert edge ' + str(e) + ' while vertex ' +
-                      str(w) + ' is not in graph yet. This resulted in '+
-                      'addition of ' + str(w) + ' to the graph.')
+      logging.warning('Attempt to insert edge %s while vertex %s is not in '
+                      'graph yet. This resulted in addition of %s to the '
+                      'graph.', e, w, w)
       self.add_vertex(w)
+    self._link(v, w, e)
+
+  def add_vertices_from(self, vs, strict=False):
+    """ Adds many vertices at once.
+
+    Vertices that are already in the graph are anomalies: with strict, the
+    first one raises ValueError; otherwise they are skipped, counted, and
+    reported in a single warning.
+
+    Args:
+      vs: iterable or numpy array of vertices or vertex labels
+      strict: whether to raise on the first anomaly
+    Returns:
+      A dictionary from kind of anomaly to count, empty if there were none
+    """
+    if isinstance(vs, numpy.ndarray):
+      vs = vs.tolist()
+    duplicates = 0
+    for v in vs:
+      if not isinstance(v, Vertex):
+        v = Vertex(v)
+      if v in self:
+        if strict:
+          raise ValueError('Vertex %s is already in the graph' % v)
+        duplicates += 1
+        continue
+      self._insert(v)
+
+    anomalies = {}
+    if duplicates:
+      anomalies['duplicate vertices'] = duplicates
+    _report_anomalies('add_vertices_from', anomalies)
+    return anomalies
+
+  def add_edges_from(self, es, strict=False):
+    """ Adds many edges at once.
+
+    Each item is an Edge, or a pair of vertices or vertex labels; an (m, 2)
+    numpy array of labels also works. Labels are converted to vertices once
+    each. The anomalies are endpoints that are not in the graph yet (added),
+    self loops (skipped) and edges that are already present (replaced): with
+    strict, the first one raises ValueError; otherwise they are counted and
+    reported in a single warning.
+
+    Args:
+      es: iterable or numpy array of edges
+      strict: whether to raise on the first anomaly
+    Returns:
+      A dictionary from kind of anomaly to count, empty if there were none
+    """
+    if isinstance(es, numpy.ndarray):
+      es = es.tolist()
+    cache = {}
+    def vertex(x):
+      if isinstance(x, Vertex):
+        return x
+      v = cache.get(x)
+      if v is None:
+        v = cache[x] = Vertex(x)
+      return v
+
+    missing = 0
+    loops = 0
+    duplicates = 0
+    for item in es:
+      if isinstance(item, Edge):
+        e = item
+        (v, w) = item
+      else:
+        e = None
+        (v, w) = item
+        v = vertex(v)
+        w = vertex(w)
+
+      if v == w:
+        if strict:
+          raise ValueError('Self loop at %s in a simple graph' % v)
+        loops += 1
+        continue
+      for x in (v, w):
+        if x not in self:
+          if strict:
+            raise ValueError('Vertex %s is not in the graph' % x)
+          missing += 1
+          self._insert(x)
+      if w in self[v]:
+        if strict:
+          raise ValueError('Edge %s is already in the graph' % (self[v][w],))
+        duplicates += 1
+      self._link(v, w, e if e is not None else Edge(v, w))
+
+    anomalies = {}
+    if missing:
+      anomalies['vertices added for edges'] = missing
+    if loops:
+      anomalies['self loops skipped'] = loops
+    if duplicates:
+      anomalies['duplicate edges replaced'] = duplicates
+    _report_anomalies('add_edges_from', anomalies)
+    return anomalies
+
+  def _link(self, v, w, e):
+    """ Records the edge e between the vertices v and w, which must be in the
+    graph. Every method that adds edges goes through here.
+    """
+    old = self[v].get(w)
+    if old is not None:
+      self.edge_set.discard(old)
+      self.fingerprint -= mix_hash(hash(old) ^ _EDGE_SALT)
     self[v][w] = e
     self[w][v] = e
+    self.edge_set.add(e)
+    self.fingerprint = (self.fingerprint +
+                        mix_hash(hash(e) ^ _EDGE_SALT)) & _MASK64
+    if self.union_find is not None and not self.union_find_stale:
+      self.union_find.union(v, w)
 
+  def _unlink(self, v, w):
+    """ Removes the edge between the vertices v and w, which must be present.
+    Every method that removes edges goes through here.
+    """
+    e = self[v][w]
+    self.edge_set.discard(e)
+    self.fingerprint = (self.fingerprint -
+                        mix_hash(hash(e) ^ _EDGE_SALT)) & _MASK64
+    del self[w][v]
+    del self[v][w]
+    # Union-find cannot split sets; rebuild it on the next query
+    self.union_find_stale = True
 
   def remove_edge(self, e):
     """ Removes an edge from the graph if the edge is present.
@@ -147,8 +490,7 @@ class Graph(dict):
       edge_not_present = w not in self[v] and v not in self[w]
       assert edge_present or edge_not_present
       if edge_present:
-        del self[w][v]
-        del self[v][w]
+        self._unlink(v, w)
       else:
         logging.warning('The edge ' + str(e) + ' is not present in the graph.')
     else:
@@ -173,6 +515,8 @@ class Graph(dict):
       # The adjacency list should be empty now.
       assert self[v] == {}
       del self[v]
+      self.fingerprint = (self.fingerprint - mix_hash(hash(v))) & _MASK64
+      self.union_find_stale = True
     else:
       logging.warning("Attempt to remove a non-existent vertex " + str(v))
 
@@ -215,11 +559,56 @@ class Graph(dict):
     Returns:
       A list of edges of the graph
     """
-    edges = Set()
-    for v in self.viewkeys():
-      for e in self[v].viewvalues():
-        edges.add(e)
-    return list(edges)
+    return list(self.edge_set)
+
+  def iter_edges(self):
+    """ Returns an iterator over the edges of the graph
+    """
+    return iter(self.edge_set)
+
+  def num_edges(self):
+    """ Returns the number of edges of the graph
+    """
+    return len(self.edge_set)
+
+  def degrees(self):
+    """ Returns an array with the degree of every vertex, in the order of
+    iteration over the graph
+    """
+    return numpy.fromiter((len(a) for a in self.itervalues()), numpy.int64,
+                          len(self))
+
+  def degree(self, v):
+    """ Returns the number of edges incident on v
+
+    Args:
+      v :  the vertex
+    Returns:
+      The degree of v, and 0 if v is not in the graph
+    """
+    if v not in self:
+      logging.warning('degree fails, because ' + str(v) + ' is not in ' +
+                      'the graph')
+      return 0
+    return len(self[v])
+
+  def density(self):
+    """ Returns the fraction of all possible edges that are present
+    """
+    n = len(self)
+    if n < 2:
+      return 0.0
+    return 2.0 * len(self.edge_set) / (n * (n - 1))
+
+  def clear(self):
+    """ Removes all vertices and edges
+    """
+    dict.clear(self)
+    self.edge_set.clear()
+    self.fingerprint = 0
+    if self.union_find is not None:
+      self.union_find = DisjointSet()
+      self.union_find_stale = False
 
   def out_vertices(self, v):
     """ Returns a list of vertices adjacent to v
@@ -250,17 +639,18 @@ class Graph(dict):
     return self[v].values()
 
   def add_all_edges(self):
-    """ Starts from an edgeless graph and adds all edges
+    """ Starts from an edgeless graph and adds all edges.
+
+    This stores all n(n-1)/2 edges; CompleteGraph represents the same graph
+    implicitly.
     """
-    if self.edges() != []:
+    if self.edge_set:
       logging.warning('Graph ' + str(self) + ' is not edgeless. Aborting add_all_edges.')
       return
     vertices = self.vertices()
-    for v in vertices:
-      for w in vertices:
-        if v == w:
-          continue
-        self[v][w] = self[w][v] if v in self[w] else Edge(v, w)
+    for (i, v) in enumerate(vertices):
+      for w in vertices[i + 1:]:
+        self._link(v, w, Edge(v, w))
 
 
   def is_graph_sane(self):
@@ -282,6 +672,57 @@ class Graph(dict):
 
     return true
 
+  def iter_bfs(self, start):
+    """ Generates the vertices reachable from start in breadth first order.
+
+    Vertices are marked when they are enqueued, so each one is enqueued once
+    and the queue never holds more than n vertices.
+
+    Args:
+      start: the start node
+    """
+    if start not in self:
+      logging.warning('bfs starts from ' + str(start) + ', which is not in ' +
+                      'the graph')
+      yield start
+      return
+    queue = deque([start])
+    visited = set([start])
+    while queue:
+      v = queue.popleft()
+      yield v
+      for w in self[v]:
+        if w not in visited:
+          visited.add(w)
+          queue.append(w)
+
+  def iter_dfs(self, start):
+    """ Generates the vertices reachable from start in depth first preorder.
+
+    Uses an explicit stack of neighbor iterators, so deep graphs do not hit
+    the recursion limit.
+
+    Args:
+      start: the start node
+    """
+    if start not in self:
+      logging.warning('dfs starts from ' + str(start) + ', which is not in ' +
+                      'the graph')
+      yield start
+      return
+    visited = set([start])
+    yield start
+    stack = [iter(self[start])]
+    while stack:
+      for w in stack[-1]:
+        if w not in visited:
+          visited.add(w)
+          yield w
+          stack.append(iter(self[w]))
+          break
+      else:
+        stack.pop()
+
   def bfs(self, start):
     """ Takes a start node and performs a bfs.
     Args:
@@ -289,15 +730,81 @@ class Graph(dict):
     Returns:
       A set of discovered nodes in the graph
     """
+    return Set(self.iter_bfs(start))
+
+  def bfs_distances(self, start, limit=None):
+    """ Computes the number of edges on a shortest path from start to every
+    vertex it reaches.
+    Args:
+      start: the start node, which must be in the graph
+      limit: largest distance to explore, unlimited if None
+    Returns:
+      A dictionary from vertex to distance
+    """
+    distances = {start: 0}
     queue = deque([start])
-    visited = Set()
     while queue:
       v = queue.popleft()
-      for w in self.out_vertices(v):
-        if w not in visited:
+      d = distances[v] + 1
+      if limit is not None and d > limit:
+        break
+      for w in self[v]:
+        if w not in distances:
+          distances[w] = d
           queue.append(w)
-      visited.add(v)
-    return visited
+    return distances
+
+  def distance_array(self, start):
+    """ Returns an array of the bfs distances from start to the vertices it
+    reaches
+    """
+    distances = self.bfs_distances(start)
+    return numpy.fromiter(distances.itervalues(), numpy.int64, len(distances))
+
+  def track_components(self, enable=True):
+    """ Starts or stops maintaining a union-find structure over the vertices.
+
+    While it is on, add_vertex and add_edge update it, and is_connected,
+    num_components and same_component use it instead of traversing the graph.
+    Removing an edge or vertex marks it stale, and it is rebuilt in O(n + m)
+    on the next query.
+
+    Args:
+      enable: whether to track components
+    """
+    if enable:
+      self.union_find_stale = True
+      self.union_find = DisjointSet()
+    else:
+      self.union_find = None
+      self.union_find_stale = False
+
+  def _components(self):
+    """ Returns the union-find structure, rebuilding it if it is stale
+    """
+    if self.union_find_stale:
+      union_find = DisjointSet(self)
+      for (v, w) in self.edge_set:
+        union_find.union(v, w)
+      self.union_find = union_find
+      self.union_find_stale = False
+    return self.union_find
+
+  def num_components(self):
+    """ Returns the number of connected components
+    """
+    if self.union_find is not None:
+      return self._components().count
+    return len(self.component_sizes())
+
+  def same_component(self, v, w):
+    """ Determines if there is a path between v and w
+    """
+    if v not in self or w not in self:
+      return False
+    if self.union_find is not None:
+      return self._components().same(v, w)
+    return any(x == w for x in self.iter_bfs(v))
 
   def is_connected(self):
     """ Determines if the graph is connected
@@ -307,16 +814,822 @@ class Graph(dict):
     if len(self) == 0:
       # An empty graph is vacuosly connected
       return True
-    visited = self.bfs(next(self.iterkeys()))
-    if len(visited) == len(self):
-      return True
-    return False
+    if self.union_find is not None:
+      return self._components().count == 1
+    count = 0
+    for v in self.iter_bfs(next(self.iterkeys())):
+      count += 1
+    return count == len(self)
+
+  def connected_components(self):
+    """ Labels every vertex with its connected component in one O(n + m) pass
+    Returns:
+      A dictionary from vertex to component label. Labels are 0, 1, 2, ...
+      in the order in which the components are discovered.
+    """
+    labels = {}
+    label = -1
+    for start in self:
+      if start in labels:
+        continue
+      label += 1
+      labels[start] = label
+      queue = deque([start])
+      while queue:
+        v = queue.popleft()
+        for w in self[v]:
+          if w not in labels:
+            labels[w] = label
+            queue.append(w)
+    return labels
+
+  def component_sizes(self, labels=None):
+    """ Counts the vertices in each connected component
+    Args:
+      labels: result of connected_components, computed if omitted
+    Returns:
+      A list whose i-th element is the size of the component labeled i
+    """
+    if labels is None:
+      labels = self.connected_components()
+    sizes = []
+    for label in labels.itervalues():
+      if label >= len(sizes):
+        sizes.extend([0] * (label + 1 - len(sizes)))
+      sizes[label] += 1
+    return sizes
+
+  def largest_component(self):
+    """ Extracts the largest connected component
+    Returns:
+      A new Graph with the vertices and edges of the largest component
+    """
+    g = Graph()
+    if len(self) == 0:
+      return g
+    labels = self.connected_components()
+    sizes = self.component_sizes(labels)
+    largest = sizes.index(max(sizes))
+    for (v, label) in labels.iteritems():
+      if label == largest:
+        g._insert(v)
+    for v in g:
+      for (w, e) in self[v].iteritems():
+        if w not in g[v]:
+          g._link(v, w, e)
+    return g
+
+  def subgraph(self, vs):
+    """ Returns a view of the subgraph induced by the vertices vs
+    """
+    return GraphView(self, vs)
+
+  def filter_edges(self, predicate):
+    """ Returns a view of the graph with only the edges e for which
+    predicate(e) is true
+    """
+    return GraphView(self, edge_filter=predicate)
+
+  def neighborhood(self, v, k=1):
+    """ Returns a view of the subgraph induced by the vertices within k edges
+    of v
+    """
+    return GraphView(self, self.bfs_distances(v, k))
+
+  def freeze(self):
+    """ Takes an immutable snapshot of the graph in compressed sparse row form
+    Returns:
+      A FrozenGraph with the same vertices and edges
+    """
+    vertices = self.keys()
+    ids = dict((v, i) for (i, v) in enumerate(vertices))
+    degrees = numpy.fromiter((len(self[v]) for v in vertices), numpy.int64,
+                             len(vertices))
+    dtype = _id_dtype(len(vertices))
+    neighbors = numpy.fromiter((ids[w] for v in vertices for w in self[v]),
+                               dtype, int(degrees.sum()))
+    return FrozenGraph(vertices, _offsets(degrees), neighbors, ids)
 
   def __eq__(self, other):
+    if self is other:
+      return True
+    if isinstance(other, Graph):
+      if self.fingerprint != other.fingerprint:
+        return False
+      return dict.__eq__(self, other)
+    if isinstance(other, dict):
+      return dict.__eq__(self, other)
     return self.__str__() == other.__str__()
 
+  def __ne__(self, other):
+    return not self.__eq__(other)
+
   def __hash__(self):
-    return hash_string(self.__str__())
+    return self.fingerprint
+
+
+class GraphView(GraphDistributions):
+  """ A read-only view of part of a Graph.
+
+  The view keeps a reference to the parent graph and filters it on the fly:
+  a vertex is in the view if it is in the parent and in the vertex set (if
+  any), and an edge is in the view if both its vertices are and it passes the
+  edge filter (if any). Nothing is copied, so creating a view is O(1) beyond
+  the vertex set, and the view reflects later changes to the parent. The read
+  API mirrors Graph; materialize copies the view into a new Graph that shares
+  the parent's Vertex and Edge objects.
+  """
+
+  def __init__(self, parent, vertices=None, edge_filter=None):
+    """ Creates a view.
+
+    Args:
+      parent: Graph
+      vertices: container of the vertices to keep, like a set or dictionary,
+        or None to keep all of them; other iterables are converted to a set
+      edge_filter: function that takes an edge and returns whether to keep it,
+        or None to keep all of them
+    """
+    if vertices is not None and not isinstance(
+        vertices, (set, frozenset, Set, dict)):
+      vertices = set(vertices)
+    self.parent = parent
+    self.vertex_set = vertices
+    self.edge_filter = edge_filter
+
+  def __contains__(self, v):
+    return v in self.parent and (self.vertex_set is None or
+                                 v in self.vertex_set)
+
+  def __iter__(self):
+    if self.vertex_set is None:
+      return iter(self.parent)
+    return (v for v in self.vertex_set if v in self.parent)
+
+  def __len__(self):
+    if self.vertex_set is None:
+      return len(self.parent)
+    return sum(1 for v in self)
+
+  def vertices(self):
+    """ Returns a list of vertices of the view
+    """
+    return list(self)
+
+  def _adjacent(self, v):
+    """ Generates (neighbor, edge) pairs of v in the view
+    """
+    vertex_set = self.vertex_set
+    keep = self.edge_filter
+    for (w, e) in self.parent[v].iteritems():
+      if ((vertex_set is None or w in vertex_set) and
+          (keep is None or keep(e))):
+        yield (w, e)
+
+  def out_vertices(self, v):
+    """ Returns a list of vertices adjacent to v
+    """
+    if v not in self:
+      logging.warning('out_vertices fails, because %s is not in the view', v)
+      return []
+    return [w for (w, e) in self._adjacent(v)]
+
+  def out_edges(self, v):
+    """ Returns a list of edges incident on v
+    """
+    if v not in self:
+      logging.warning('out_edges fails, because %s is not in the view', v)
+      return []
+    return [e for (w, e) in self._adjacent(v)]
+
+  def degree(self, v):
+    """ Returns the number of edges incident on v in the view, and 0 if v is
+    not in the view
+    """
+    if v not in self:
+      logging.warning('degree fails, because %s is not in the view', v)
+      return 0
+    return sum(1 for _ in self._adjacent(v))
+
+  def degrees(self):
+    """ Returns an array with the degree of every vertex, in the order of
+    iteration over the view
+    """
+    return numpy.fromiter((sum(1 for _ in self._adjacent(v)) for v in self),
+                          numpy.int64)
+
+  def get_edge(self, v1, v2):
+    """ Returns the edge between vertices v1 and v2 if it exists, None otherwise
+    """
+    if v1 not in self or v2 not in self:
+      return None
+    e = self.parent[v1].get(v2)
+    if e is None or (self.edge_filter is not None and
+                     not self.edge_filter(e)):
+      return None
+    return e
+
+  def iter_edges(self):
+    """ Generates the edges of the view
+    """
+    if self.vertex_set is None:
+      keep = self.edge_filter
+      return (e for e in self.parent.edge_set if keep is None or keep(e))
+    # Each edge is seen from both ends; report it from its first vertex
+    return (e for v in self for (w, e) in self._adjacent(v) if e[0] == v)
+
+  def edges(self):
+    """ Returns a list of edges of the view
+    """
+    return list(self.iter_edges())
+
+  def num_edges(self):
+    """ Returns the number of edges of the view
+    """
+    if self.vertex_set is None and self.edge_filter is None:
+      return self.parent.num_edges()
+    return sum(1 for _ in self.iter_edges())
+
+  def iter_bfs(self, start):
+    """ Generates the vertices reachable from start in breadth first order
+    """
+    if start not in self:
+      logging.warning('bfs starts from %s, which is not in the view', start)
+      yield start
+      return
+    queue = deque([start])
+    visited = set([start])
+    while queue:
+      v = queue.popleft()
+      yield v
+      for (w, e) in self._adjacent(v):
+        if w not in visited:
+          visited.add(w)
+          queue.append(w)
+
+  def bfs(self, start):
+    """ Takes a start node and performs a bfs.
+    Args:
+      start: the start node
+    Returns:
+      A set of discovered nodes in the view
+    """
+    return Set(self.iter_bfs(start))
+
+  def bfs_distances(self, start, limit=None):
+    """ Computes the number of edges on a shortest path from start to every
+    vertex it reaches in the view.
+    Args:
+      start: the start node, which must be in the view
+      limit: largest distance to explore, unlimited if None
+    Returns:
+      A dictionary from vertex to distance
+    """
+    distances = {start: 0}
+    queue = deque([start])
+    while queue:
+      v = queue.popleft()
+      d = distances[v] + 1
+      if limit is not None and d > limit:
+        break
+      for (w, e) in self._adjacent(v):
+        if w not in distances:
+          distances[w] = d
+          queue.append(w)
+    return distances
+
+  def distance_array(self, start):
+    """ Returns an array of the bfs distances from start to the vertices it
+    reaches
+    """
+    distances = self.bfs_distances(start)
+    return numpy.fromiter(distances.itervalues(), numpy.int64, len(distances))
+
+  def is_connected(self):
+    """ Determines if the view is connected
+    Returns:
+      true if the view is connected, false otherwise
+    """
+    start = next(iter(self), None)
+    if start is None:
+      return True
+    return len(self.bfs_distances(start)) == len(self)
+
+  def component_sizes(self):
+    """ Counts the vertices in each connected component
+    Returns:
+      A list of component sizes, one per component
+    """
+    seen = set()
+    sizes = []
+    for v in self:
+      if v not in seen:
+        component = self.bfs_distances(v)
+        seen.update(component)
+        sizes.append(len(component))
+    return sizes
+
+  def subgraph(self, vs):
+    """ Returns a view of the subgraph of this view induced by vs
+    """
+    return GraphView(self.parent, Set(v for v in vs if v in self),
+                     self.edge_filter)
+
+  def filter_edges(self, predicate):
+    """ Returns a view of this view with only the edges e for which
+    predicate(e) is also true
+    """
+    keep = self.edge_filter
+    if keep is not None:
+      predicate = lambda e, p=predicate: keep(e) and p(e)
+    return GraphView(self.parent, self.vertex_set, predicate)
+
+  def neighborhood(self, v, k=1):
+    """ Returns a view of the subgraph of this view induced by the vertices
+    within k edges of v
+    """
+    return GraphView(self.parent, self.bfs_distances(v, k), self.edge_filter)
+
+  def materialize(self):
+    """ Copies the view into a new, mutable Graph
+    """
+    g = Graph()
+    for v in self:
+      g._insert(v)
+    for e in self.iter_edges():
+      g._link(e[0], e[1], e)
+    return g
+
+
+def _id_dtype(n):
+  """ The smallest integer type that can hold the ids of n vertices
+  """
+  return numpy.int32 if n < 2 ** 31 else numpy.int64
+
+def _offsets(degrees):
+  """ Converts an array of degrees into CSR row offsets
+  """
+  offsets = numpy.zeros(len(degrees) + 1, numpy.int64)
+  numpy.cumsum(degrees, out=offsets[1:])
+  return offsets
+
+
+class FrozenGraph(GraphDistributions):
+  """ An immutable graph in compressed sparse row (CSR) form.
+
+  Vertices are numbered 0..n-1. The neighbors of vertex i are
+  neighbors[offsets[i]:offsets[i+1]], sorted by id, so the whole adjacency
+  structure takes two integer arrays. The read API mirrors Graph and takes and
+  returns Vertex objects; the *_ids methods work on integer ids directly.
+  Edges carry no data beyond their endpoints.
+  """
+
+  def __init__(self, vertices, offsets, neighbors, ids=None,
+               rows_sorted=False):
+    """ Creates a frozen graph.
+
+    Args:
+      vertices: sequence of vertices, indexed by id; it is not copied
+      offsets: array of n+1 row offsets into neighbors
+      neighbors: array of neighbor ids, each undirected edge stored twice
+      ids: mapping from vertex to id, built from vertices when first needed
+        if omitted
+      rows_sorted: whether every row of neighbors is already sorted
+    """
+    self.by_id = vertices
+    self._ids = ids
+    self.offsets = numpy.asarray(offsets)
+    self.neighbors = numpy.asarray(neighbors)
+
+    # Sort each row so that edge queries can binary search
+    if not rows_sorted:
+      rows = numpy.repeat(numpy.arange(len(self.by_id)), self.degrees())
+      order = numpy.lexsort((self.neighbors, rows))
+      if numpy.any(order != numpy.arange(len(order))):
+        self.neighbors = self.neighbors[order]
+
+  @property
+  def ids(self):
+    """ The mapping from vertex to id
+    """
+    if self._ids is None:
+      self._ids = dict((v, i) for (i, v) in enumerate(self.by_id))
+    return self._ids
+
+  def __len__(self):
+    return len(self.by_id)
+
+  def __contains__(self, v):
+    return v in self.ids
+
+  def __iter__(self):
+    return iter(self.by_id)
+
+  def degrees(self):
+    """ Returns an array with the degree of every vertex, indexed by id
+    """
+    return numpy.diff(self.offsets)
+
+  def degree(self, v):
+    """ Returns the number of edges incident on v
+    """
+    i = self.ids[v]
+    return int(self.offsets[i + 1] - self.offsets[i])
+
+  def num_edges(self):
+    """ Returns the number of edges of the graph
+    """
+    return len(self.neighbors) // 2
+
+  def vertex_ids(self, vs):
+    """ Maps a sequence of vertices to an array of ids
+    """
+    return numpy.fromiter((self.ids[v] for v in vs), numpy.int64)
+
+  def neighbor_ids(self, i):
+    """ Returns the array of ids adjacent to id i. The result is a view.
+    """
+    return self.neighbors[self.offsets[i]:self.offsets[i + 1]]
+
+  def has_edge_ids(self, i, j):
+    """ Determines if there is an edge between ids i and j
+    """
+    row = self.neighbor_ids(i)
+    k = numpy.searchsorted(row, j)
+    return k < len(row) and row[k] == j
+
+  def edge_ids(self):
+    """ Returns an (m, 2) array of the edges as id pairs with i < j
+    """
+    rows = numpy.repeat(numpy.arange(len(self.by_id)), self.degrees())
+    mask = rows < self.neighbors
+    return numpy.column_stack((rows[mask], self.neighbors[mask]))
+
+  def vertices(self):
+    """ Returns a list of vertices of the graph
+    """
+    return list(self.by_id)
+
+  def out_vertices(self, v):
+    """ Returns a list of vertices adjacent to v
+    """
+    if v not in self.ids:
+      logging.warning('out_vertices fails, because %s is not in the graph', v)
+      return []
+    return [self.by_id[j] for j in self.neighbor_ids(self.ids[v])]
+
+  def out_edges(self, v):
+    """ Returns a list of edges incident on v
+    """
+    return [Edge(v, w) for w in self.out_vertices(v)]
+
+  def get_edge(self, v1, v2):
+    """ Returns the edge between vertices v1 and v2 if it exists, None otherwise
+    """
+    if v1 not in self.ids or v2 not in self.ids:
+      return None
+    if self.has_edge_ids(self.ids[v1], self.ids[v2]):
+      return Edge(v1, v2)
+    return None
+
+  def edges(self):
+    """ Returns a list of edges of the graph
+    """
+    vs = self.by_id
+    return [Edge(vs[i], vs[j]) for (i, j) in self.edge_ids()]
+
+  def bfs_levels(self, start):
+    """ Performs a level-synchronous bfs over ids.
+    Args:
+      start: the start id
+    Returns:
+      A list of arrays; the i-th holds the ids at distance i from start
+    """
+    visited = numpy.zeros(len(self.by_id), bool)
+    visited[start] = True
+    frontier = numpy.array([start])
+    levels = [frontier]
+    while len(frontier):
+      starts = self.offsets[frontier]
+      lengths = self.offsets[frontier + 1] - starts
+      total = lengths.sum()
+      if total == 0:
+        break
+      # Gather the rows of every frontier vertex into one index array
+      shifts = numpy.repeat(starts - numpy.cumsum(lengths) + lengths, lengths)
+      candidates = self.neighbors[shifts + numpy.arange(total)]
+      frontier = numpy.unique(candidates[~visited[candidates]])
+      if len(frontier) == 0:
+        break
+      visited[frontier] = True
+      levels.append(frontier)
+    return levels
+
+  def bfs_ids(self, start):
+    """ Performs a level-synchronous bfs over ids.
+    Args:
+      start: the start id
+    Returns:
+      An array with the ids reachable from start, in bfs order
+    """
+    return numpy.concatenate(self.bfs_levels(start))
+
+  def distance_array(self, start):
+    """ Returns an array of the bfs distances from start to the vertices it
+    reaches
+    """
+    levels = self.bfs_levels(self.ids[start])
+    return numpy.repeat(numpy.arange(len(levels)), [len(l) for l in levels])
+
+  def component_sizes(self):
+    """ Counts the vertices in each connected component
+    Returns:
+      An array of component sizes, one per component
+    """
+    n = len(self.by_id)
+    if n == 0:
+      return numpy.zeros(0, numpy.int64)
+    adjacency = scipy.sparse.csr_matrix(
+        (numpy.ones(len(self.neighbors), numpy.int8), self.neighbors,
+         self.offsets), shape=(n, n))
+    _, labels = scipy.sparse.csgraph.connected_components(adjacency,
+                                                          directed=False)
+    return numpy.bincount(labels)
+
+  def bfs(self, start):
+    """ Takes a start node and performs a bfs.
+    Args:
+      start: the start node
+    Returns:
+      A set of discovered nodes in the graph
+    """
+    vs = self.by_id
+    return Set(vs[i] for i in self.bfs_ids(self.ids[start]))
+
+  def is_connected(self):
+    """ Determines if the graph is connected
+    Returns:
+      true if the graph is connected, false otherwise
+    """
+    if len(self.by_id) == 0:
+      return True
+    return len(self.bfs_ids(0)) == len(self.by_id)
+
+  def thaw(self):
+    """ Converts the snapshot back into a mutable Graph
+    """
+    vs = self.by_id
+    g = Graph(vs)
+    g.add_edges_from(Edge(vs[i], vs[j]) for (i, j) in self.edge_ids())
+    return g
+
+
+class CompleteGraph(GraphDistributions):
+  """ An implicit complete graph, from which edges can be deleted.
+
+  Adjacency is computed on demand: every pair of vertices is an edge unless
+  it has been removed, and only the removed pairs are stored, as sets of ids
+  per vertex. So the graph takes O(n + d) memory for d removed edges instead
+  of O(n^2), and so do out_vertices, edges, bfs and is_connected, which work
+  on the complement: a bfs step visits every unvisited vertex except the
+  removed neighbors of the current one, so a whole bfs takes O(n + d) time.
+
+  The read API mirrors Graph; edges and iter_edges return iterators, since a
+  list of the edges would be quadratic. materialize converts it to a Graph.
+  """
+
+  def __init__(self, vs=[]):
+    """ Creates a complete graph.
+
+    Args:
+      vs: list of vertices, with distinct labels
+    """
+    self.by_id = list(vs)
+    self.ids = dict((v, i) for (i, v) in enumerate(self.by_id))
+    if len(self.ids) != len(self.by_id):
+      raise ValueError('Vertices of a complete graph must be distinct')
+    self.removed = {}
+    self.num_removed = 0
+
+  def __len__(self):
+    return len(self.by_id)
+
+  def __contains__(self, v):
+    return v in self.ids
+
+  def __iter__(self):
+    return iter(self.by_id)
+
+  def vertices(self):
+    """ Returns a list of vertices of the graph
+    """
+    return list(self.by_id)
+
+  def _removed(self, i):
+    """ Returns the set of ids whose edge to id i was removed
+    """
+    return self.removed.get(i, ())
+
+  def has_edge_ids(self, i, j):
+    """ Determines if there is an edge between ids i and j
+    """
+    return i != j and j not in self._removed(i)
+
+  def get_edge(self, v1, v2):
+    """ Returns the edge between vertices v1 and v2 if it exists, None otherwise
+    """
+    if v1 not in self.ids or v2 not in self.ids:
+      return None
+    if self.has_edge_ids(self.ids[v1], self.ids[v2]):
+      return Edge(v1, v2)
+    return None
+
+  def remove_edge(self, e):
+    """ Removes an edge from the graph if the edge is present. Otherwise, it
+    does nothing.
+
+    Args:
+      e: The edge to be removed
+    """
+    (v, w) = e
+    if v not in self.ids or w not in self.ids:
+      logging.warning('One of the vertices for the edge %s is not present in '
+                      'the graph. Edge deletion unsuccessful.', e)
+      return
+    i = self.ids[v]
+    j = self.ids[w]
+    if not self.has_edge_ids(i, j):
+      logging.warning('The edge %s is not present in the graph.', e)
+      return
+    self.removed.setdefault(i, set()).add(j)
+    self.removed.setdefault(j, set()).add(i)
+    self.num_removed += 1
+
+  def add_edge(self, e):
+    """ Restores an edge that was removed. Both vertices must be in the graph.
+
+    Args:
+      e: the edge to be added
+    """
+    (v, w) = e
+    i = self.ids[v]
+    j = self.ids[w]
+    if i == j or self.has_edge_ids(i, j):
+      return
+    for (x, y) in ((i, j), (j, i)):
+      self.removed[x].discard(y)
+      if not self.removed[x]:
+        del self.removed[x]
+    self.num_removed -= 1
+
+  def num_edges(self):
+    """ Returns the number of edges of the graph
+    """
+    n = len(self.by_id)
+    return n * (n - 1) // 2 - self.num_removed
+
+  def density(self):
+    """ Returns the fraction of all possible edges that are present
+    """
+    n = len(self.by_id)
+    if n < 2:
+      return 0.0
+    return 2.0 * self.num_edges() / (n * (n - 1))
+
+  def degree(self, v):
+    """ Returns the number of edges incident on v
+    """
+    return len(self.by_id) - 1 - len(self._removed(self.ids[v]))
+
+  def degrees(self):
+    """ Returns an array with the degree of every vertex, indexed by id
+    """
+    n = len(self.by_id)
+    degrees = numpy.empty(n, numpy.int64)
+    degrees.fill(n - 1)
+    for (i, js) in self.removed.iteritems():
+      degrees[i] -= len(js)
+    return degrees
+
+  def iter_out_ids(self, i):
+    """ Generates the ids adjacent to id i
+    """
+    removed = self._removed(i)
+    for j in xrange(len(self.by_id)):
+      if j != i and j not in removed:
+        yield j
+
+  def out_vertices(self, v):
+    """ Returns a list of vertices adjacent to v
+    """
+    if v not in self.ids:
+      logging.warning('out_vertices fails, because %s is not in the graph', v)
+      return []
+    vs = self.by_id
+    return [vs[j] for j in self.iter_out_ids(self.ids[v])]
+
+  def out_edges(self, v):
+    """ Returns a list of edges incident on v
+    """
+    return [Edge(v, w) for w in self.out_vertices(v)]
+
+  def iter_edges(self):
+    """ Generates the edges of the graph
+    """
+    vs = self.by_id
+    for i in xrange(len(vs)):
+      removed = self._removed(i)
+      for j in xrange(i + 1, len(vs)):
+        if j not in removed:
+          yield Edge(vs[i], vs[j])
+
+  def edges(self):
+    """ Returns an iterator over the edges of the graph
+    """
+    return self.iter_edges()
+
+  def bfs_levels(self, start, unvisited=None):
+    """ Performs a bfs over ids on the complement of the removed edges.
+    Args:
+      start: the start id
+      unvisited: set of ids not visited yet, which is updated; every id but
+        start if omitted
+    Returns:
+      A list of lists; the i-th holds the ids at distance i from start
+    """
+    if unvisited is None:
+      unvisited = set(xrange(len(self.by_id)))
+    unvisited.discard(start)
+    frontier = [start]
+    levels = [frontier]
+    while frontier and unvisited:
+      reached = []
+      for i in frontier:
+        removed = self._removed(i)
+        if not removed:
+          reached.extend(unvisited)
+          unvisited.clear()
+          break
+        # Every unvisited vertex is adjacent, except the removed neighbors
+        kept = unvisited.intersection(removed)
+        reached.extend(unvisited.difference(kept))
+        unvisited.intersection_update(kept)
+        if not unvisited:
+          break
+      if not reached:
+        break
+      frontier = reached
+      levels.append(frontier)
+    return levels
+
+  def bfs(self, start):
+    """ Takes a start node and performs a bfs.
+    Args:
+      start: the start node
+    Returns:
+      A set of discovered nodes in the graph
+    """
+    vs = self.by_id
+    return Set(vs[i] for level in self.bfs_levels(self.ids[start])
+               for i in level)
+
+  def distance_array(self, start):
+    """ Returns an array of the bfs distances from start to the vertices it
+    reaches
+    """
+    levels = self.bfs_levels(self.ids[start])
+    return numpy.repeat(numpy.arange(len(levels)), [len(l) for l in levels])
+
+  def component_sizes(self):
+    """ Counts the vertices in each connected component
+    Returns:
+      A list of component sizes, one per component
+    """
+    unvisited = set(xrange(len(self.by_id)))
+    sizes = []
+    while unvisited:
+      start = unvisited.pop()
+      sizes.append(sum(len(l) for l in self.bfs_levels(start, unvisited)))
+    return sizes
+
+  def is_connected(self):
+    """ Determines if the graph is connected
+    Returns:
+      true if the graph is connected, false otherwise
+    """
+    n = len(self.by_id)
+    # Disconnecting a complete graph takes at least n - 1 removed edges
+    if n == 0 or self.num_removed < n - 1:
+      return True
+    return sum(len(l) for l in self.bfs_levels(0)) == n
+
+  def materialize(self):
+    """ Builds a Graph with the same vertices and edges
+    """
+    g = Graph(self.by_id)
+    g.add_edges_from(self.iter_edges())
+    return g
+
 
 def getRandomCoinFlip(p):
   max_flips = 10000
@@ -330,15 +1643,63 @@ def getRandomCoinFlip(p):
       yield coin_flips[position]
       position += 1
 
+def sample_gnp_edges(n, p, rng=None):
+  """ Samples the edges of an Erdos-Renyi G(n, p) random graph.
+
+  Each of the n(n-1)/2 unordered pairs is present independently with
+  probability p. Instead of flipping a coin per pair, this draws the
+  geometrically distributed gaps between present pairs (Batagelj and Brandes,
+  2005), so it takes O(n + m) time for m edges.
+
+  Args:
+    n: number of vertices
+    p: probability that an edge is present
+    rng: numpy RandomState, or a seed for one; by default the global
+      numpy.random generator, so numpy.random.seed makes the sample
+      reproducible
+  Returns:
+    Two arrays of vertex ids (v, w) with w < v, one entry per edge
+  """
+  if not 0 <= p <= 1:
+    raise ValueError('Edge probability must be in [0, 1], got %r' % p)
+  if rng is None:
+    rng = numpy.random
+  elif not isinstance(rng, numpy.random.RandomState):
+    rng = numpy.random.RandomState(rng)
+
+  # Pairs (v, w) with w < v are numbered t = v(v-1)/2 + w
+  num_pairs = n * (n - 1) // 2
+  chunks = []
+  last = -1
+  while p > 0 and last < num_pairs:
+    expected = p * (num_pairs - last)
+    size = int(min(expected + 5 * expected ** 0.5 + 16, 1 << 22))
+    t = last + numpy.cumsum(rng.geometric(p, size))
+    last = t[-1]
+    chunks.append(t[t < num_pairs])
+  t = numpy.concatenate(chunks) if chunks else numpy.zeros(0, numpy.int64)
+
+  v = numpy.floor((1 + numpy.sqrt(1 + 8.0 * t)) / 2).astype(numpy.int64)
+  # Correct for floating point error in the square root
+  v -= v * (v - 1) // 2 > t
+  v += (v + 1) * v // 2 <= t
+  w = t - v * (v - 1) // 2
+  return v, w
+
 class RandomGraph(Graph):
-  def __init__(self, n, p):
+  def __init__(self, n, p, seed=None):
     """ Creates a random graph with the parameters n,p
     Args:
       n : number of vertices
       p: Probability that an edge is present in the graph
+      seed: seed or numpy RandomState for the edge sampler; by default
+        the global numpy.random generator
     """
-    coin = getRandomCoinFlip(p)
+    Graph.__init__(self)
     vertices = [Vertex('v' + str(i)) for i in xrange(n)]
-    edges = [Edge(v,w) for v in vertices for w in vertices if v != w and next(coin) == 1]
-    Graph.__init__(self, vertices, edges)
-
+    for v in vertices:
+      self._insert(v)
+    for (i, j) in zip(*sample_gnp_edges(n, p, seed)):
+      v = vertices[i]
+      w = vertices[j]
+      self._link(v, w, Edge(v, w))
@@ -0,0 +1,288 @@
+"""Reading and writing graphs.
+
+Text edge lists have one edge per line, as two vertex labels separated by
+whitespace (or a given delimiter); a line with a single label is an isolated
+vertex, and anything after a '#' is a comment. Readers and writers stream
+line by line, so memory does not grow with the size of the file beyond the
+graph itself.
+
+The binary format stores a frozen graph so that it can be memory-mapped:
+
+  magic      8 bytes, 'TBGRAPH' followed by the version byte 1
+  header     8 little-endian int64s: n, length of neighbors, bytes per
+             neighbor id (4 or 8), label kind (0 for int, 1 for string),
+             length of the string blob, and three reserved zeros
+  offsets    int64[n + 1], CSR row offsets
+  neighbors  int32 or int64, CSR neighbor ids, sorted within each row
+  order      int64[n], ids sorted by label
+  labels     int64[n] for int labels; for string labels, int64[n + 1]
+             offsets into a blob of UTF-8 bytes that follows
+
+Every section starts on an 8 byte boundary. open_binary maps the file and
+builds nothing proportional to its size: labels are decoded on access and
+looked up by binary search over the sorted order.
+"""
+
+import struct
+
+import numpy
+
+from Graph import FrozenGraph
+from Graph import Graph
+from Graph import Vertex
+
+MAGIC = 'TBGRAPH\x01'
+_HEADER = struct.Struct('<8q')
+_INT_LABELS = 0
+_STR_LABELS = 1
+
+
+def _open(f, mode):
+  """ Opens f if it is a path
+  Returns:
+    tuple of (file object, whether the caller must close it)
+  """
+  if isinstance(f, basestring):
+    return open(f, mode), True
+  return f, False
+
+
+def _parse_edges(lines, graph, label_type, delimiter, comments):
+  """ Generates label pairs from lines, adding isolated vertices to graph
+  """
+  for line in lines:
+    if comments:
+      line = line.split(comments, 1)[0]
+    tokens = line.split(delimiter)
+    if delimiter is not None:
+      tokens = [t.strip() for t in tokens if t.strip()]
+    if len(tokens) == 1:
+      v = Vertex(label_type(tokens[0]))
+      if v not in graph:
+        graph.add_vertex(v)
+    elif tokens:
+      yield (label_type(tokens[0]), label_type(tokens[1]))
+
+
+def read_edge_list(f, graph=None, label_type=str, delimiter=None,
+                   comments='#', strict=False):
+  """ Reads a text edge list, streaming it line by line into a graph.
+
+  Extra columns after the two labels are ignored.
+
+  Args:
+    f: path or file object
+    graph: Graph to add to, a new one if omitted
+    label_type: function that converts a token into a label, like str or int
+    delimiter: string between labels, any whitespace if None
+    comments: string that starts a comment
+    strict: passed to Graph.add_edges_from
+  Returns:
+    the graph
+  """
+  if graph is None:
+    graph = Graph()
+  f, close = _open(f, 'r')
+  try:
+    graph.add_edges_from(_parse_edges(f, graph, label_type, delimiter,
+                                      comments), strict)
+  finally:
+    if close:
+      f.close()
+  return graph
+
+
+def write_edge_list(graph, f, delimiter=' '):
+  """ Writes a graph as a text edge list.
+
+  Isolated vertices come first, one per line. Labels are written with str, so
+  they should not contain the delimiter, newlines or the comment character.
+
+  Args:
+    graph: Graph or FrozenGraph
+    f: path or file object
+    delimiter: string between labels
+  """
+  f, close = _open(f, 'w')
+  try:
+    if isinstance(graph, FrozenGraph):
+      vs = graph.by_id
+      for i in numpy.flatnonzero(graph.degrees() == 0):
+        f.write('%s\n' % vs[i].label)
+      for (i, j) in graph.edge_ids():
+        f.write('%s%s%s\n' % (vs[i].label, delimiter, vs[j].label))
+    else:
+      for v in graph:
+        if not graph[v]:
+          f.write('%s\n' % v.label)
+      for (v, w) in graph.iter_edges():
+        f.write('%s%s%s\n' % (v.label, delimiter, w.label))
+  finally:
+    if close:
+      f.close()
+
+
+class LabelTable(object):
+  """ A read-only sequence of vertices whose labels are stored in arrays.
+
+  Int labels are an int64 array; string labels are slices of a byte blob.
+  """
+
+  def __init__(self, labels=None, label_offsets=None, blob=None):
+    """ Creates a label table from int labels, or from string offsets and blob
+    """
+    self.labels = labels
+    self.label_offsets = label_offsets
+    self.blob = blob
+
+  def __len__(self):
+    if self.labels is not None:
+      return len(self.labels)
+    return len(self.label_offsets) - 1
+
+  def label(self, i):
+    """ Returns the label of id i
+    """
+    if self.labels is not None:
+      return int(self.labels[i])
+    start = self.label_offsets[i]
+    return self.blob[start:self.label_offsets[i + 1]].tostring()
+
+  def __getitem__(self, i):
+    return Vertex(self.label(i))
+
+  def __iter__(self):
+    for i in xrange(len(self)):
+      yield self[i]
+
+
+class LabelIndex(object):
+  """ A read-only mapping from vertex to id that binary searches the ids
+  sorted by label, instead of building a dictionary.
+  """
+
+  def __init__(self, table, order):
+    """ Creates the index
+    Args:
+      table: LabelTable
+      order: array of ids sorted by label
+    """
+    self.table = table
+    self.order = order
+    self.kind = int if table.labels is not None else str
+
+  def get(self, v, default=None):
+    label = v.label
+    if not isinstance(label, self.kind):
+      return default
+    lo = 0
+    hi = len(self.order)
+    while lo < hi:
+      mid = (lo + hi) // 2
+      if self.table.label(self.order[mid]) < label:
+        lo = mid + 1
+      else:
+        hi = mid
+    if lo < len(self.order) and self.table.label(self.order[lo]) == label:
+      return int(self.order[lo])
+    return default
+
+  def __contains__(self, v):
+    return self.get(v) is not None
+
+  def __getitem__(self, v):
+    i = self.get(v)
+    if i is None:
+      raise KeyError(v)
+    return i
+
+
+def _pad(f):
+  """ Pads the file with zeros to an 8 byte boundary
+  """
+  f.write('\0' * (-f.tell() % 8))
+
+
+def write_binary(graph, path):
+  """ Writes a graph in the binary format.
+
+  Labels must all be ints, or all be strings.
+
+  Args:
+    graph: Graph or FrozenGraph
+    path: path of the file
+  """
+  if not isinstance(graph, FrozenGraph):
+    graph = graph.freeze()
+  n = len(graph)
+  labels = [v.label for v in graph.by_id]
+  if all(isinstance(x, (int, long)) for x in labels):
+    kind = _INT_LABELS
+  elif all(isinstance(x, str) for x in labels):
+    kind = _STR_LABELS
+  else:
+    raise ValueError('Labels must all be ints or all be strings')
+  order = numpy.array(sorted(xrange(n), key=labels.__getitem__),
+                      numpy.int64)
+  neighbors = graph.neighbors
+  if n < 2 ** 31:
+    neighbors = neighbors.astype(numpy.int32)
+
+  with open(path, 'wb') as f:
+    blob = ''.join(labels) if kind == _STR_LABELS else ''
+    f.write(MAGIC)
+    f.write(_HEADER.pack(n, len(neighbors), neighbors.itemsize, kind,
+                         len(blob), 0, 0, 0))
+    f.write(numpy.asarray(graph.offsets, '<i8').tostring())
+    f.write(neighbors.astype(neighbors.dtype.newbyteorder('<')).tostring())
+    _pad(f)
+    f.write(order.astype('<i8').tostring())
+    if kind == _INT_LABELS:
+      f.write(numpy.array(labels, '<i8').tostring())
+    else:
+      lengths = numpy.array([len(x) for x in labels], numpy.int64)
+      offsets = numpy.zeros(n + 1, numpy.int64)
+      numpy.cumsum(lengths, out=offsets[1:])
+      f.write(offsets.astype('<i8').tostring())
+      f.write(blob)
+
+
+def _map(path, dtype, offset, count):
+  """ Memory-maps count items of dtype at offset, or returns an empty array
+  """
+  if count == 0:
+    return numpy.zeros(0, dtype)
+  return numpy.memmap(path, dtype, 'r', offset, (count,))
+
+
+def open_binary(path):
+  """ Opens a graph in the binary format without reading it into memory
+  Args:
+    path: path of the file
+  Returns:
+    FrozenGraph backed by read-only memory maps
+  """
+  with open(path, 'rb') as f:
+    magic = f.read(len(MAGIC))
+    if magic != MAGIC:
+      raise ValueError('%s is not a binary graph file' % path)
+    (n, nnz, itemsize, kind, blob_len, _, _, _) = _HEADER.unpack(
+        f.read(_HEADER.size))
+
+  pos = len(MAGIC) + _HEADER.size
+  offsets = _map(path, '<i8', pos, n + 1)
+  pos += 8 * (n + 1)
+  neighbors = _map(path, '<i%d' % itemsize, pos, nnz)
+  pos += itemsize * nnz
+  pos += -pos % 8
+  order = _map(path, '<i8', pos, n)
+  pos += 8 * n
+  if kind == _INT_LABELS:
+    table = LabelTable(labels=_map(path, '<i8', pos, n))
+  else:
+    label_offsets = _map(path, '<i8', pos, n + 1)
+    pos += 8 * (n + 1)
+    table = LabelTable(label_offsets=label_offsets,
+                       blob=_map(path, 'S1', pos, blob_len))
+  return FrozenGraph(table, offsets, neighbors, LabelIndex(table, order),
+                     rows_sorted=True)
@@ -0,0 +1,82 @@
+"""
+Test file for GraphIO.py
+"""
+import os
+import shutil
+import tempfile
+import unittest
+from StringIO import StringIO
+from sets import Set
+from Graph import Edge
+from Graph import Graph
+from Graph import RandomGraph
+from Graph import Vertex
+from GraphIO import open_binary
+from GraphIO import read_edge_list
+from GraphIO import write_binary
+from GraphIO import write_edge_list
+
+class GraphIOTest(unittest.TestCase):
+
+  def setUp(self):
+    self.dir = tempfile.mkdtemp()
+
+  def tearDown(self):
+    shutil.rmtree(self.dir)
+
+  def test_read_edge_list(self):
+    text = StringIO('# a comment\n'
+                    'a b\n'
+                    'b c 0.5\n'
+                    '\n'
+                    'd  # an isolated vertex\n'
+                    'a b\n')
+    g = read_edge_list(text)
+    self.assertEqual(Set(v.label for v in g), Set(['a', 'b', 'c', 'd']))
+    self.assertEqual(g.num_edges(), 2)
+    self.assertEqual(g.degree(Vertex('d')), 0)
+
+    g = read_edge_list(StringIO('1,2\n2,3\n'), label_type=int, delimiter=',')
+    self.assertTrue(g.get_edge(Vertex(3), Vertex(2)) is not None)
+
+  def test_edge_list_round_trip(self):
+    g = RandomGraph(30, 0.1, seed=1)
+    g.add_vertex(Vertex('lonely'))
+    path = os.path.join(self.dir, 'g.txt')
+    write_edge_list(g, path)
+    self.assertEqual(read_edge_list(path), g)
+
+    write_edge_list(g.freeze(), path)
+    self.assertEqual(read_edge_list(path), g)
+
+  def test_binary_round_trip(self):
+    path = os.path.join(self.dir, 'g.bin')
+    g = RandomGraph(40, 0.1, seed=2)
+    g.add_vertex(Vertex('lonely'))
+    write_binary(g, path)
+    f = open_binary(path)
+    self.assertEqual(len(f), 41)
+    self.assertEqual(f.num_edges(), g.num_edges())
+    self.assertEqual(f.thaw(), g)
+    self.assertEqual(f.degree(Vertex('lonely')), 0)
+    self.assertFalse(Vertex('missing') in f)
+    self.assertFalse(Vertex(3) in f)
+    self.assertEqual(f.bfs(Vertex('v0')), g.bfs(Vertex('v0')))
+
+    vs = [Vertex(i) for i in range(5)]
+    g = Graph(vs, [Edge(vs[0], vs[4]), Edge(vs[1], vs[2])])
+    write_binary(g, path)
+    f = open_binary(path)
+    self.assertEqual(f.thaw(), g)
+    self.assertEqual(f.get_edge(vs[4], vs[0]), Edge(vs[0], vs[4]))
+    self.assertFalse(f.is_connected())
+
+    write_binary(Graph(), path)
+    self.assertEqual(len(open_binary(path)), 0)
+
+    mixed = Graph([Vertex(1), Vertex('a')])
+    self.assertRaises(ValueError, write_binary, mixed, path)
+
+
+if __name__ == "__main__":
+  unittest.main()
@@ -1,11 +1,17 @@
 """
 Test file for Graph.py
 """
+import pickle
 import unittest
+import numpy
+from Graph import CompleteGraph
+from Graph import DisjointSet
 from Graph import Graph
+from Graph import GraphView
 from Graph import Edge
 from Graph import Vertex
 from Graph import RandomGraph
+from Graph import sample_gnp_edges
 from sets import Set
 
 class GraphTest(unittest.TestCase):
@@ -23,6 +29,27 @@ class GraphTest(unittest.TestCase):
     """
     self.assertEqual(sorted(l1), sorted(l2))
 
+  def test_vertex_equality(self):
+    v = Vertex('v')
+    self.assertEqual(v, Vertex('v'))
+    self.assertEqual(hash(v), hash(Vertex('v')))
+    self.assertNotEqual(v, Vertex('w'))
+    self.assertNotEqual(Vertex(1), Vertex(1.0))
+    self.assertFalse(v != Vertex('v'))
+
+    # Vertices have no per-instance dictionary
+    self.assertFalse(hasattr(v, '__dict__'))
+
+  def test_edge_equality(self):
+    v = Vertex('v')
+    w = Vertex('w')
+    e = Edge(v, w)
+    self.assertEqual(e, Edge(Vertex('w'), Vertex('v')))
+    self.assertEqual(hash(e), hash(Edge(Vertex('w'), Vertex('v'))))
+    self.assertNotEqual(e, Edge(v, Vertex('x')))
+    self.assertEqual(pickle.loads(pickle.dumps(e, 2)), e)
+    self.assertFalse(hasattr(e, '__dict__'))
+
   def test_add_vertex(self):
     g = Graph()
     # Tests that a label is used only once.
@@ -55,6 +82,34 @@ class GraphTest(unittest.TestCase):
     g.add_edge(e)
     self.assertEqual(g, {v:{w:e}, w:{v:e}})
 
+  def test_add_from(self):
+    g = Graph()
+    self.assertEqual(g.add_vertices_from(['a', 'b', Vertex('c')]), {})
+    self.assertEqual(g.add_vertices_from(numpy.array(['c', 'd'])),
+                     {'duplicate vertices': 1})
+    self.verify_list_equal_unordered(
+        [v.label for v in g.vertices()], ['a', 'b', 'c', 'd'])
+
+    anomalies = g.add_edges_from([('a', 'b'), ('b', 'e'), ('c', 'c'),
+                                  Edge(Vertex('b'), Vertex('a'))])
+    self.assertEqual(anomalies, {'vertices added for edges': 1,
+                                 'self loops skipped': 1,
+                                 'duplicate edges replaced': 1})
+    self.assertEqual(g.num_edges(), 2)
+    self.assertEqual(g.get_edge(Vertex('e'), Vertex('b')),
+                     Edge(Vertex('b'), Vertex('e')))
+
+    g.add_edges_from(numpy.array([[1, 2], [2, 3]]))
+    self.assertEqual(g.num_edges(), 4)
+    self.assertEqual(g.degree(Vertex(2)), 2)
+
+    # Strict mode raises on the first anomaly
+    self.assertRaises(ValueError, g.add_vertices_from, ['a'], True)
+    self.assertRaises(ValueError, g.add_edges_from, [('a', 'z')], True)
+    self.assertRaises(ValueError, g.add_edges_from, [('a', 'a')], True)
+    self.assertRaises(ValueError, g.add_edges_from, [('a', 'b')], True)
+    self.assertEqual(g.add_edges_from([('a', 'd')], strict=True), {})
+
   def test_remove_edge(self):
     g = Graph()
     v = Vertex('v')
@@ -187,6 +242,44 @@ class GraphTest(unittest.TestCase):
     g.add_edge(e3)
     self.verify_list_equal_unordered(g.edges(), [e1, e2, e3])
 
+  def test_edge_counts(self):
+    g = Graph()
+    v = Vertex('v')
+    w = Vertex('w')
+    x = Vertex('x')
+    e1 = Edge(v,w)
+    e2 = Edge(w,x)
+    e3 = Edge(v,x)
+
+    self.assertEqual(g.num_edges(), 0)
+    self.assertEqual(g.density(), 0.0)
+
+    g.add_edge(e1)
+    g.add_edge(e2)
+    g.add_edge(e3)
+    # Adding an edge twice does not count it twice
+    g.add_edge(Edge(w,v))
+    self.assertEqual(g.num_edges(), 3)
+    self.assertEqual(g.degree(v), 2)
+    self.assertEqual(g.density(), 1.0)
+    self.verify_list_equal_unordered(list(g.iter_edges()), [e1, e2, e3])
+
+    g.remove_edge(e1)
+    self.assertEqual(g.num_edges(), 2)
+    self.assertEqual(g.degree(v), 1)
+
+    g.remove_vertex(x)
+    self.assertEqual(g.num_edges(), 0)
+    self.assertEqual(g.degree(x), 0)
+
+    g.add_vertex(x)
+    g.add_all_edges()
+    self.assertEqual(g.num_edges(), 3)
+
+    g.clear()
+    self.assertEqual(g.num_edges(), 0)
+    self.assertEqual(g.edges(), [])
+
   def test_out_vertices(self):
     g = Graph()
     v = Vertex('v')
@@ -287,6 +380,125 @@ class GraphTest(unittest.TestCase):
     self.verify_list_equal_unordered(list(g.bfs(v)), [v,w,x])
     self.verify_list_equal_unordered(list(g.bfs(v)), list(g.bfs(w)))
 
+  def test_traversals(self):
+    vs = [Vertex(i) for i in range(7)]
+    # A path 0-1-2-3 with a branch 1-4, and a separate edge 5-6
+    es = [Edge(vs[0],vs[1]), Edge(vs[1],vs[2]), Edge(vs[2],vs[3]),
+          Edge(vs[1],vs[4]), Edge(vs[5],vs[6])]
+    g = Graph(vs, es)
+
+    order = list(g.iter_bfs(vs[0]))
+    self.verify_list_equal_unordered(order, vs[:5])
+    self.assertEqual(order[:2], [vs[0], vs[1]])
+    self.assertEqual(order[-1], vs[3])
+
+    order = list(g.iter_dfs(vs[0]))
+    self.verify_list_equal_unordered(order, vs[:5])
+    self.assertEqual(order[:2], [vs[0], vs[1]])
+    # Depth first visits 3 right after 2, whichever branch it takes first
+    self.assertEqual(order[order.index(vs[2]) + 1], vs[3])
+
+    # A complete graph enqueues each vertex once
+    k = Graph([Vertex(i) for i in range(6)])
+    k.add_all_edges()
+    self.assertEqual(len(list(k.iter_bfs(Vertex(0)))), 6)
+
+  def test_connected_components(self):
+    vs = [Vertex(i) for i in range(7)]
+    es = [Edge(vs[0],vs[1]), Edge(vs[1],vs[2]), Edge(vs[5],vs[6])]
+    g = Graph(vs, es)
+
+    labels = g.connected_components()
+    self.assertEqual(len(labels), 7)
+    self.assertEqual(labels[vs[0]], labels[vs[2]])
+    self.assertEqual(labels[vs[5]], labels[vs[6]])
+    self.assertNotEqual(labels[vs[0]], labels[vs[5]])
+    self.assertNotEqual(labels[vs[3]], labels[vs[4]])
+    self.verify_list_equal_unordered(g.component_sizes(), [3, 2, 1, 1])
+
+    h = g.largest_component()
+    self.verify_list_equal_unordered(h.vertices(), vs[:3])
+    self.verify_list_equal_unordered(h.edges(), es[:2])
+    self.assertTrue(h.is_connected())
+
+    self.assertEqual(Graph().component_sizes(), [])
+    self.assertEqual(Graph().largest_component(), {})
+
+  def test_track_components(self):
+    vs = [Vertex(i) for i in range(5)]
+    g = Graph(vs)
+    g.track_components()
+    self.assertEqual(g.num_components(), 5)
+    self.assertFalse(g.is_connected())
+
+    g.add_edge(Edge(vs[0], vs[1]))
+    g.add_edge(Edge(vs[2], vs[3]))
+    self.assertEqual(g.num_components(), 3)
+    self.assertTrue(g.same_component(vs[0], Vertex(1)))
+    self.assertFalse(g.same_component(vs[0], vs[2]))
+
+    g.add_edge(Edge(vs[1], vs[2]))
+    g.add_edge(Edge(vs[3], vs[4]))
+    self.assertTrue(g.is_connected())
+
+    # Removals are handled by rebuilding
+    g.remove_edge(Edge(vs[1], vs[2]))
+    self.assertEqual(g.num_components(), 2)
+    self.assertFalse(g.is_connected())
+    g.remove_vertex(vs[4])
+    self.assertEqual(g.num_components(), 2)
+
+    g.add_vertex(Vertex(5))
+    self.assertEqual(g.num_components(), 3)
+    g.add_edge(Edge(vs[3], Vertex(5)))
+    self.assertEqual(g.num_components(), 2)
+
+    # The untracked answers agree
+    g.track_components(False)
+    self.assertEqual(g.num_components(), 2)
+    self.assertTrue(g.same_component(vs[2], Vertex(5)))
+    self.assertFalse(g.same_component(vs[0], Vertex(5)))
+
+  def test_disjoint_set(self):
+    d = DisjointSet(range(4))
+    self.assertEqual(d.count, 4)
+    self.assertTrue(d.union(0, 1))
+    self.assertFalse(d.union(1, 0))
+    self.assertTrue(d.union(2, 3))
+    self.assertTrue(d.same(0, 1))
+    self.assertFalse(d.same(1, 2))
+    self.assertTrue(d.union(0, 3))
+    self.assertEqual(d.count, 1)
+
+  def test_fingerprint(self):
+    vs = [Vertex(i) for i in range(4)]
+    es = [Edge(vs[0],vs[1]), Edge(vs[1],vs[2]), Edge(vs[2],vs[3])]
+    g = Graph(vs, es)
+    h = Graph(list(reversed(vs)), list(reversed(es)))
+    self.assertEqual(g, h)
+    self.assertEqual(hash(g), hash(h))
+
+    # Changes are reflected and undone
+    empty = hash(Graph(vs))
+    h.add_edge(Edge(vs[0], vs[3]))
+    self.assertNotEqual(g, h)
+    self.assertNotEqual(hash(g), hash(h))
+    h.remove_edge(Edge(vs[0], vs[3]))
+    self.assertEqual(g, h)
+    for e in es:
+      h.remove_edge(e)
+    self.assertEqual(hash(h), empty)
+    h.remove_vertex(vs[3])
+    h.add_vertex(Vertex(3))
+    self.assertEqual(hash(h), empty)
+    h.clear()
+    self.assertEqual(hash(h), hash(Graph()))
+
+    # Same vertices and edge count, different edges
+    k = Graph(vs, [Edge(vs[0],vs[2]), Edge(vs[1],vs[2]), Edge(vs[2],vs[3])])
+    self.assertNotEqual(g, k)
+    self.assertEqual(len(Set([hash(g), hash(k), empty])), 3)
+
   def test_is_connected(self):
     v = Vertex('v')
     w = Vertex('w')
@@ -311,6 +523,149 @@ class GraphTest(unittest.TestCase):
     g = Graph([v,w,x], [e1, e2])
     self.assertTrue(g.is_connected())
 
+  def test_freeze(self):
+    v = Vertex('v')
+    w = Vertex('w')
+    x = Vertex('x')
+    y = Vertex('y')
+    z = Vertex('z')
+    a = Vertex('a')
+    e1 = Edge(v,w)
+    e2 = Edge(w,x)
+    e3 = Edge(v,x)
+    e4 = Edge(y,z)
+    g = Graph([v,w,x,y,z,a], [e1,e2,e3,e4])
+    f = g.freeze()
+
+    self.assertEqual(len(f), 6)
+    self.assertEqual(f.num_edges(), 4)
+    self.verify_list_equal_unordered(f.vertices(), g.vertices())
+    self.verify_list_equal_unordered(f.edges(), g.edges())
+    self.verify_list_equal_unordered(f.out_vertices(v), [w, x])
+    self.verify_list_equal_unordered(f.out_vertices(a), [])
+    self.assertEqual(f.degree(w), 2)
+    self.assertEqual(f.get_edge(x, v), e3)
+    self.assertEqual(f.get_edge(v, y), None)
+
+    self.verify_list_equal_unordered(list(f.bfs(a)), [a])
+    self.verify_list_equal_unordered(list(f.bfs(y)), [y, z])
+    self.verify_list_equal_unordered(list(f.bfs(v)), [v,w,x])
+    self.assertFalse(f.is_connected())
+    self.assertTrue(Graph([v,w,x], [e1,e2]).freeze().is_connected())
+    self.assertTrue(Graph().freeze().is_connected())
+
+    # Round trip back to a mutable graph
+    h = f.thaw()
+    self.verify_list_equal_unordered(h.vertices(), g.vertices())
+    self.verify_list_equal_unordered(h.edges(), g.edges())
+
+  def test_complete_graph(self):
+    vs = [Vertex(i) for i in range(6)]
+    k = CompleteGraph(vs)
+    g = Graph(vs)
+    g.add_all_edges()
+    self.assertEqual(k.num_edges(), 15)
+    self.assertEqual(Set(k.edges()), Set(g.edges()))
+    self.assertTrue(k.is_connected())
+
+    # Isolate vertex 5 and split the rest into {0, 1, 2} and {3, 4}
+    removed = [Edge(vs[i], vs[5]) for i in range(5)]
+    removed += [Edge(vs[i], vs[j]) for i in range(3) for j in (3, 4)]
+    for e in removed:
+      k.remove_edge(e)
+      g.remove_edge(e)
+    k.remove_edge(removed[0])
+    self.assertEqual(k.num_removed, 11)
+    self.assertEqual(k.num_edges(), g.num_edges())
+    self.assertEqual(Set(k.edges()), Set(g.edges()))
+    self.verify_list_equal_unordered(k.out_vertices(vs[3]), [vs[4]])
+    self.assertEqual(k.degree(vs[0]), 2)
+    self.assertEqual(k.get_edge(vs[0], vs[3]), None)
+    self.assertEqual(k.get_edge(vs[1], vs[0]), Edge(vs[0], vs[1]))
+    self.assertEqual(k.bfs(vs[0]), g.bfs(vs[0]))
+    self.assertEqual(k.bfs(vs[5]), Set([vs[5]]))
+    self.assertFalse(k.is_connected())
+    self.verify_list_equal_unordered(k.component_sizes(), [3, 2, 1])
+    self.assertEqual(k.degree_hist().GetDict(), g.degree_hist().GetDict())
+    self.assertEqual(k.materialize(), g)
+
+    # Restoring edges reconnects it
+    k.add_edge(Edge(vs[2], vs[3]))
+    k.add_edge(Edge(vs[4], vs[5]))
+    self.assertTrue(k.is_connected())
+    self.assertEqual(k.distance_hist(vs[0]).GetDict(), {0: 1, 1: 2, 2: 1,
+                                                        3: 1, 4: 1})
+    self.assertTrue(CompleteGraph().is_connected())
+    self.assertRaises(ValueError, CompleteGraph, [Vertex(1), Vertex(1)])
+
+  def test_views(self):
+    vs = [Vertex(i) for i in range(7)]
+    es = [Edge(vs[0],vs[1]), Edge(vs[1],vs[2]), Edge(vs[2],vs[3]),
+          Edge(vs[3],vs[4]), Edge(vs[4],vs[0]), Edge(vs[5],vs[6])]
+    g = Graph(vs, es)
+
+    # Induced subgraph
+    s = g.subgraph(vs[:4])
+    self.assertEqual(len(s), 4)
+    self.assertFalse(vs[4] in s)
+    self.verify_list_equal_unordered(s.out_vertices(vs[0]), [vs[1]])
+    self.verify_list_equal_unordered(s.out_edges(vs[3]), [es[2]])
+    self.verify_list_equal_unordered(s.edges(), es[:3])
+    self.assertEqual(s.get_edge(vs[4], vs[0]), None)
+    self.assertEqual(s.degree(vs[3]), 1)
+    self.assertEqual(s.degree(vs[4]), 0)
+    self.assertEqual(g.subgraph(vs[:2]).degree(vs[2]), 0)
+    self.assertEqual(s.degree(Vertex(99)), 0)
+    self.assertEqual(sorted(s.degrees()), [1, 1, 2, 2])
+    self.assertTrue(s.is_connected())
+    self.assertEqual(s.bfs(vs[0]), Set(vs[:4]))
+
+    # Filtered edges
+    f = g.filter_edges(lambda e: e != es[0])
+    self.assertEqual(f.num_edges(), 5)
+    self.assertEqual(f.get_edge(vs[0], vs[1]), None)
+    self.verify_list_equal_unordered(f.component_sizes(), [5, 2])
+    self.assertEqual(f.distance_hist(vs[0]).GetDict(),
+                     {0: 1, 1: 1, 2: 1, 3: 1, 4: 1})
+    self.assertEqual(f.subgraph(vs[:3]).num_edges(), 1)
+
+    # Neighborhoods, and views reflect changes to the parent
+    n = g.neighborhood(vs[0], 1)
+    self.assertEqual(Set(n), Set([vs[0], vs[1], vs[4]]))
+    self.assertTrue(n.is_connected())
+    self.assertEqual(Set(f.neighborhood(vs[0], 2)), Set([vs[0], vs[4], vs[3]]))
+    g.remove_edge(es[0])
+    self.assertEqual(n.num_edges(), 1)
+    self.assertEqual(len(g.subgraph(vs[5:]).materialize()), 2)
+
+    # Materializing gives a mutable graph that shares edges with the parent
+    h = f.materialize()
+    self.assertTrue(isinstance(h, Graph))
+    self.assertEqual(h, g)
+    self.assertTrue(h.get_edge(vs[5], vs[6]) is g.get_edge(vs[5], vs[6]))
+    self.assertTrue(GraphView(Graph()).is_connected())
+
+  def test_distributions(self):
+    vs = [Vertex(i) for i in range(7)]
+    es = [Edge(vs[0],vs[1]), Edge(vs[1],vs[2]), Edge(vs[2],vs[3]),
+          Edge(vs[1],vs[3]), Edge(vs[5],vs[6])]
+    g = Graph(vs, es)
+    for h in (g, g.freeze()):
+      self.verify_list_equal_unordered(h.degrees(), [1, 3, 2, 2, 0, 1, 1])
+      self.assertEqual(h.degree_hist().GetDict(), {0: 1, 1: 3, 2: 2, 3: 1})
+      self.assertAlmostEqual(h.degree_pmf().Prob(1), 3 / 7.0)
+      self.assertEqual(h.degree_cdf().Value(0.5), 1)
+      self.assertEqual(h.component_size_hist().GetDict(), {1: 1, 2: 1, 4: 1})
+      self.assertAlmostEqual(h.component_size_pmf().Prob(4), 1 / 3.0)
+      self.assertEqual(h.component_size_cdf().Value(1), 4)
+      self.assertEqual(h.distance_hist(vs[0]).GetDict(), {0: 1, 1: 1, 2: 2})
+      self.assertAlmostEqual(h.distance_pmf(vs[0]).Prob(2), 0.5)
+      self.assertEqual(h.distance_cdf(vs[4]).Items(), [(0, 1.0)])
+    self.assertEqual(g.bfs_distances(vs[3]), {vs[0]: 2, vs[1]: 1, vs[2]: 1,
+                                              vs[3]: 0})
+    self.assertEqual(Graph().degree_hist().GetDict(), {})
+    self.assertEqual(Graph().freeze().component_size_hist().GetDict(), {})
+
   def test_random_graph(self):
     print RandomGraph(4,0.0)
     print RandomGraph(4,0.1)
@@ -319,6 +674,33 @@ class GraphTest(unittest.TestCase):
     print RandomGraph(4,0.9)
     print RandomGraph(4,1.0)
 
+    # Extreme probabilities give edgeless and complete graphs
+    self.assertEqual(RandomGraph(5, 0.0).edges(), [])
+    self.assertEqual(len(RandomGraph(5, 1.0).edges()), 10)
+
+    # The same seed gives the same graph
+    self.assertEqual(Set(RandomGraph(30, 0.2, seed=7).edges()),
+                     Set(RandomGraph(30, 0.2, seed=7).edges()))
+
+    # Without a seed, the global generator is used
+    numpy.random.seed(0)
+    edges = Set(RandomGraph(30, 0.2).edges())
+    numpy.random.seed(0)
+    self.assertEqual(Set(RandomGraph(30, 0.2).edges()), edges)
+
+  def test_sample_gnp_edges(self):
+    v, w = sample_gnp_edges(6, 1.0)
+    self.verify_list_equal_unordered(zip(v, w), [(i, j) for i in range(6)
+                                                 for j in range(i)])
+
+    n = 500
+    v, w = sample_gnp_edges(n, 0.05, rng=3)
+    self.assertTrue(((0 <= w) & (w < v) & (v < n)).all())
+    self.assertEqual(len(Set(zip(v, w))), len(v))
+    # The edge count is within 5 standard deviations of its mean
+    mean = 0.05 * n * (n - 1) / 2
+    self.assertTrue(abs(len(v) - mean) < 5 * (mean * 0.95) ** 0.5)
+
 
 
 
@@ -9,25 +9,34 @@ License: GNU GPLv3 http://www.gnu.org/licenses/gpl.html
 
 Hist: represents a histogram (map from values to integer frequencies).
 
+StreamingHist: a Hist that counts numbers into bins, in bounded memory.
+
 Pmf: represents a probability mass function (map from values to probs).
 
 _DictWrapper: private parent class for Hist and Pmf.
 
 Cdf: represents a discrete cumulative distribution function
 
+QuantileSketch: a mergeable summary of a stream of numbers, from which
+a Cdf can be made at any time
+
 Pdf: represents a continuous probability density function
 
 """
 
 import bisect
 import copy
+import itertools
 import logging
 import math
+import multiprocessing
 import numpy
 import random
+import time
 
+import scipy.special
 import scipy.stats
-from scipy.special import erf, erfinv
+from scipy.special import ndtr, ndtri
 
 
 def Odds(p):
@@ -73,33 +82,81 @@ def Probability2(yes, no):
 class Interpolator(object):
     """Represents a mapping between sorted sequences; performs linear interp.
 
+    Lookup and Reverse accept numbers or arrays.  The sequences are
+    checked and the slopes computed once, at construction; if the
+    sequence being searched is uniformly spaced, lookups index it
+    directly instead of searching.
+
     Attributes:
         xs: sorted list
         ys: sorted list
     """
 
     def __init__(self, xs, ys):
+        if len(xs) != len(ys) or len(xs) == 0:
+            raise ValueError('xs and ys must be non-empty and the same length')
         self.xs = xs
         self.ys = ys
 
+        xs = numpy.asarray(xs, dtype=float)
+        ys = numpy.asarray(ys, dtype=float)
+        if numpy.any(numpy.diff(xs) < 0):
+            raise ValueError('xs must be sorted')
+
+        self.forward = self._Table(xs, ys)
+        self.backward = None
+        if numpy.all(numpy.diff(ys) >= 0):
+            self.backward = self._Table(ys, xs)
+
+    @staticmethod
+    def _Table(xs, ys):
+        """Precomputes what a lookup from xs to ys needs.
+
+        Returns: tuple of (xs, ys, slopes, step), where step is the
+            spacing of xs if it is uniform, and None otherwise
+        """
+        dxs = numpy.diff(xs)
+        with numpy.errstate(divide='ignore', invalid='ignore'):
+            slopes = numpy.where(dxs > 0, numpy.diff(ys) / dxs, 0.0)
+
+        step = None
+        if len(xs) > 1 and dxs[0] > 0:
+            if numpy.allclose(dxs, dxs[0], rtol=1e-9, atol=0):
+                step = (xs[-1] - xs[0]) / (len(xs) - 1)
+        return xs, ys, slopes, step
+
     def Lookup(self, x):
         """Looks up x and returns the corresponding value of y."""
-        return self._Bisect(x, self.xs, self.ys)
+        return self._Interpolate(x, self.forward)
 
     def Reverse(self, y):
         """Looks up y and returns the corresponding value of x."""
-        return self._Bisect(y, self.ys, self.xs)
+        if self.backward is None:
+            raise ValueError('Reverse lookup needs ys to be sorted')
+        return self._Interpolate(y, self.backward)
+
+    def _Interpolate(self, x, table):
+        """Helper function.
+
+        x: number or array
+        table: result of _Table
+
+        Returns: float or array
+        """
+        xs, ys, slopes, step = table
+        if step is None:
+            res = numpy.interp(x, xs, ys)
+        else:
+            x = numpy.asarray(x, dtype=float)
+            i = numpy.clip(((x - xs[0]) // step).astype(int),
+                           0, len(slopes) - 1)
+            res = ys[i] + slopes[i] * (x - xs[i])
+            res = numpy.where(x <= xs[0], ys[0],
+                              numpy.where(x >= xs[-1], ys[-1], res))
 
-    def _Bisect(self, x, xs, ys):
-        """Helper function."""
-        if x <= xs[0]:
-            return ys[0]
-        if x >= xs[-1]:
-            return ys[-1]
-        i = bisect.bisect(xs, x)
-        frac = 1.0 * (x - xs[i - 1]) / (xs[i] - xs[i - 1])
-        y = ys[i - 1] + frac * 1.0 * (ys[i] - ys[i - 1])
-        return y
+        if numpy.ndim(res) == 0:
+            return float(res)
+        return res
 
 
 class _DictWrapper(object):
@@ -113,6 +170,13 @@ class _DictWrapper(object):
         self.name = name
         self.d = {}
 
+        # flag whether d is shared with a copy; see Copy and _Detach
+        self.shared = False
+
+        # flag whether d has been handed out by GetDict, so that the
+        # caller might modify it; see Copy
+        self.exported = False
+
         # flag whether the distribution is under a log transform
         self.log = False
 
@@ -179,17 +243,32 @@ class _DictWrapper(object):
     def Copy(self, name=None):
         """Returns a copy.
 
-        Make a shallow copy of d.  If you want a deep copy of d,
-        use copy.deepcopy on the whole object.
+        The copy shares d with this object until either of them is
+        modified; the first Set, Incr, Mult, Remove or Normalize makes
+        a private shallow copy of d.  If d has been handed out by
+        GetDict, the copy gets its own d right away.  If you want a
+        deep copy of d, use copy.deepcopy on the whole object.
 
         Args:
             name: string name for the new Hist
         """
         new = copy.copy(self)
-        new.d = copy.copy(self.d)
+        if self.exported:
+            new.d = dict(self.d)
+            new.shared = False
+            new.exported = False
+        else:
+            self.shared = True
+            new.shared = True
         new.name = name if name is not None else self.name
         return new
 
+    def _Detach(self):
+        """Makes d private to this object before it is modified."""
+        if self.shared:
+            self.d = dict(self.d)
+            self.shared = False
+
     def Scale(self, factor):
         """Multiplies the values by a factor.
 
@@ -198,7 +277,7 @@ class _DictWrapper(object):
         Returns: new object
         """
         new = self.Copy()
-        new.d.clear()
+        new.SetDict({})
 
         for val, prob in self.Items():
             new.Set(val * factor, prob)
@@ -242,12 +321,20 @@ class _DictWrapper(object):
             self.Set(x, math.exp(p - m))
 
     def GetDict(self):
-        """Gets the dictionary."""
+        """Gets the dictionary.
+
+        The caller may modify the result, so it is never shared, and
+        later copies of this object get their own.
+        """
+        self._Detach()
+        self.exported = True
         return self.d
 
     def SetDict(self, d):
         """Sets the dictionary."""
         self.d = d
+        self.shared = False
+        self.exported = False
 
     def Values(self):
         """Gets an unsorted sequence of values.
@@ -282,6 +369,7 @@ class _DictWrapper(object):
             x: number value
             y: number freq or prob
         """
+        self._Detach()
         self.d[x] = y
 
     def Incr(self, x, term=1):
@@ -291,6 +379,7 @@ class _DictWrapper(object):
             x: number value
             term: how much to increment by
         """
+        self._Detach()
         self.d[x] = self.d.get(x, 0) + term
 
     def Mult(self, x, factor):
@@ -300,6 +389,7 @@ class _DictWrapper(object):
             x: number value
             factor: how much to multiply by
         """
+        self._Detach()
         self.d[x] = self.d.get(x, 0) * factor
 
     def Remove(self, x):
@@ -310,6 +400,7 @@ class _DictWrapper(object):
         Args:
             x: value to remove
         """
+        self._Detach()
         del self.d[x]
 
     def Total(self):
@@ -357,6 +448,123 @@ class Hist(_DictWrapper):
             self.Incr(val, -freq)
 
 
+class StreamingHist(Hist):
+    """Represents a histogram of numbers counted into equal-width bins.
+
+    Bin i covers [origin + i * width, origin + (i+1) * width) and its
+    value is the midpoint, so with the defaults, width 1 and origin
+    -0.5, integers are counted exactly.  If max_bins is given, the width
+    doubles whenever there would be more bins than that, merging
+    neighboring pairs of bins, so memory stays bounded however many
+    values are counted, whatever their range.
+
+    Error bound: the frequencies add up to the number of values counted,
+    exactly, and each value is represented by the midpoint of its bin,
+    at most width / 2 away.  So the Cdf is exact at the bin edges, and
+    in between it is off by at most the fraction of values in one bin.
+
+    Histograms with the same origin whose widths differ by a power of
+    two, such as any that started out with the same width, can be merged.
+
+    Attributes:
+        width: current bin width
+        origin: an edge of every bin
+        max_bins: most bins to keep, or None for fixed binning
+    """
+
+    def __init__(self, width=1, origin=-0.5, max_bins=None, name=''):
+        if width <= 0:
+            raise ValueError('width must be positive')
+        if max_bins is not None and max_bins < 2:
+            raise ValueError('max_bins must be at least 2')
+        Hist.__init__(self, name=name)
+        self.width = float(width)
+        self.origin = float(origin)
+        self.max_bins = max_bins
+
+    def _Index(self, x):
+        """Returns the index of the bin a number or array falls in."""
+        return numpy.floor((x - self.origin) / self.width)
+
+    def _Key(self, i):
+        """Returns the midpoint of bin i, for a number or array."""
+        return self.origin + (i + 0.5) * self.width
+
+    def _Bins(self):
+        """Returns arrays of bin indices and their frequencies.
+
+        The frequencies are ints, unless some are not.
+        """
+        index = self._Index(numpy.array(self.d.keys(), dtype=float))
+        counts = numpy.array(self.d.values())
+        if len(counts) == 0:
+            counts = numpy.zeros(0, numpy.int64)
+        return index.astype(numpy.int64), counts
+
+    def _SetBins(self, index, counts):
+        """Replaces the bins, adding up duplicates and doubling the width
+        until there are at most max_bins.
+        """
+        while True:
+            index, inverse = numpy.unique(index, return_inverse=True)
+            sums = numpy.zeros(len(index), counts.dtype)
+            numpy.add.at(sums, inverse, counts)
+            counts = sums
+            if self.max_bins is None or len(index) <= self.max_bins:
+                break
+            index //= 2
+            self.width *= 2
+        self.SetDict(dict(zip(self._Key(index).tolist(), counts.tolist())))
+
+    def Incr(self, x, term=1):
+        """Counts a number into its bin.
+
+        Args:
+            x: number value
+            term: how much to increment the frequency by
+        """
+        Hist.Incr(self, self._Key(math.floor((x - self.origin) / self.width)),
+                  term)
+        if self.max_bins is not None and len(self.d) > self.max_bins:
+            self._SetBins(*self._Bins())
+
+    def IncrArray(self, a):
+        """Counts an array of numbers, in one vectorized pass.
+
+        Args:
+            a: array or sequence of numbers
+        """
+        index, counts = numpy.unique(
+            self._Index(numpy.asarray(a, dtype=float)), return_counts=True)
+        old_index, old_counts = self._Bins()
+        self._SetBins(
+            numpy.concatenate([old_index, index.astype(numpy.int64)]),
+            numpy.concatenate([old_counts, counts]))
+
+    def Merge(self, other):
+        """Adds the counts of another StreamingHist to this one.
+
+        The result has the wider of the two bin widths.
+
+        Args:
+            other: StreamingHist with the same origin
+        """
+        width = max(self.width, other.width)
+        ratios = [width / self.width, width / other.width]
+        if (self.origin != other.origin or
+            any(math.frexp(r)[0] != 0.5 for r in ratios)):
+            raise ValueError('StreamingHists must have the same origin and '
+                             'widths that differ by a power of two')
+
+        index, counts = self._Bins()
+        other_index, other_counts = other._Bins()
+        self.width = width
+        self._SetBins(
+            numpy.concatenate([index // int(ratios[0]),
+                               other_index // int(ratios[1])]),
+            numpy.concatenate([counts, other_counts]))
+
+
 class Pmf(_DictWrapper):
     """Represents a probability mass function.
     
@@ -410,6 +618,7 @@ class Pmf(_DictWrapper):
             return total
 
         factor = float(fraction) / total
+        self._Detach()
         for x in self.d:
             self.d[x] *= factor
 
@@ -637,7 +846,24 @@ def MakeHistFromList(t, name=''):
         Hist object
     """
     hist = Hist(name=name)
-    [hist.Incr(x) for x in t]
+    for x in t:
+        hist.Incr(x)
+    return hist
+
+
+def MakeHistFromArray(a, name=''):
+    """Makes a histogram from an array of values in one vectorized pass.
+
+    Args:
+        a: array or sequence of numbers
+        name: string name for this histogram
+
+    Returns:
+        Hist object
+    """
+    values, counts = numpy.unique(a, return_counts=True)
+    hist = Hist(name=name)
+    hist.SetDict(dict(zip(values.tolist(), counts.tolist())))
     return hist
 
 
@@ -671,6 +897,23 @@ def MakePmfFromList(t, name=''):
     return pmf
 
 
+def MakePmfFromArray(a, name=''):
+    """Makes a PMF from an array of values in one vectorized pass.
+
+    Args:
+        a: array or sequence of numbers
+        name: string name for this PMF
+
+    Returns:
+        Pmf object
+    """
+    values, counts = numpy.unique(a, return_counts=True)
+    pmf = Pmf(name=name)
+    pmf.SetDict(dict(zip(values.tolist(),
+                         (counts / float(counts.sum())).tolist())))
+    return pmf
+
+
 def MakePmfFromDict(d, name=''):
     """Makes a PMF from a map from values to probabilities.
 
@@ -1053,6 +1296,200 @@ def MakeCdfFromList(seq, name=''):
     return MakeCdfFromHist(hist, name)
 
 
+def MakeCdfFromArray(a, name=''):
+    """Creates a CDF from an array of values in one vectorized pass.
+
+    Args:
+        a: array or sequence of numbers
+        name: string name for the cdf
+
+    Returns:
+       Cdf object
+    """
+    values, counts = numpy.unique(a, return_counts=True)
+    if len(values) == 0:
+        return Cdf([], [], name)
+    cs = numpy.cumsum(counts)
+    return Cdf(values.tolist(), (cs / float(cs[-1])).tolist(), name)
+
+
+class QuantileSketch(object):
+    """Represents a summary of a stream of numbers, in bounded memory,
+    from which a Cdf can be made at any time.
+
+    This is the KLL sketch (Karnin, Lang and Liberty, "Optimal Quantile
+    Approximation in Streams", 2016).  The numbers are kept in levels,
+    and a number at level h stands for 2**h of the numbers counted.  When
+    a level fills up, it is sorted and every other number, starting with
+    the first or the second at random, moves up a level.  The weights
+    always add up to the number of values counted.
+
+    Memory: about 3 * k numbers, plus one per level, and the number of
+    levels grows like log2(n / k).
+
+    Error bound: the Cdf of any one value is within about 1.7 / k of the
+    true fraction, with probability 99%, however large n is; for the
+    default k=200 that is 0.85%.  Sketches can be merged, for instance
+    after counting on several workers, without losing accuracy.
+
+    Attributes:
+        k: accuracy parameter
+        n: number of values counted
+        levels: list of arrays of the numbers kept at each level
+        name: string name for the Cdf
+    """
+
+    def __init__(self, k=200, seed=0, name=''):
+        """Initializes an empty sketch.
+
+        k: accuracy parameter, at least 8
+        seed: seed for the coin flips made when levels are compacted;
+            with the default, the same numbers in the same order always
+            give the same sketch, and None flips fresh coins every time
+        name: string name for the Cdf
+        """
+        if k < 8:
+            raise ValueError('k must be at least 8')
+        self.k = k
+        self.n = 0
+        self.levels = [numpy.zeros(0)]
+        self.name = name
+        self.rng = numpy.random.RandomState(seed)
+
+        # numbers counted one at a time, by level, waiting to be added
+        self.pending = [[]]
+        self.num_pending = 0
+
+    def __len__(self):
+        return self.n
+
+    def Total(self):
+        """Returns the number of values counted."""
+        return self.n
+
+    def NumRetained(self):
+        """Returns the number of numbers the sketch keeps."""
+        return (sum(len(level) for level in self.levels) +
+                self.num_pending)
+
+    def _Capacity(self, h):
+        """Returns the size at which level h gets compacted."""
+        height = len(self.levels) - h - 1
+        return int(math.ceil(self.k * (2.0 / 3) ** height)) + 1
+
+    def _Compact(self, h):
+        """Moves every other number of level h up a level."""
+        if h + 1 == len(self.levels):
+            self.levels.append(numpy.zeros(0))
+        level = numpy.sort(self.levels[h])
+        odd = len(level) % 2
+        start = odd + self.rng.randint(2)
+        self.levels[h] = level[:odd]
+        self.levels[h + 1] = numpy.concatenate([self.levels[h + 1],
+                                                level[start::2]])
+
+    def _Compress(self):
+        """Compacts levels, lowest first, until the sketch fits."""
+        while True:
+            size = sum(len(level) for level in self.levels)
+            capacity = sum(self._Capacity(h) for h in range(len(self.levels)))
+            if size < capacity:
+                return
+            for h in range(len(self.levels)):
+                if len(self.levels[h]) >= self._Capacity(h):
+                    self._Compact(h)
+                    break
+
+    def _Flush(self):
+        """Adds the numbers counted one at a time to their levels."""
+        if not self.num_pending:
+            return
+        while len(self.levels) < len(self.pending):
+            self.levels.append(numpy.zeros(0))
+        for h, values in enumerate(self.pending):
+            if values:
+                self.levels[h] = numpy.concatenate([self.levels[h], values])
+        self.pending = [[]]
+        self.num_pending = 0
+        self._Compress()
+
+    def Incr(self, x, term=1):
+        """Counts a number term times.
+
+        A count is split into powers of two, and the number goes into
+        the level of each one.
+
+        Args:
+            x: number value
+            term: non-negative int, how many times to count x
+        """
+        if (not isinstance(term, (int, long, numpy.integer)) or
+            term < 0):
+            raise ValueError('term must be a non-negative integer, got %r' %
+                             (term,))
+        term = int(term)
+        self.n += term
+        h = 0
+        while term:
+            if term & 1:
+                while len(self.pending) <= h:
+                    self.pending.append([])
+                self.pending[h].append(x)
+                self.num_pending += 1
+            term >>= 1
+            h += 1
+        if self.num_pending >= self.k:
+            self._Flush()
+
+    def IncrArray(self, a):
+        """Counts an array of numbers, in one vectorized pass.
+
+        Args:
+            a: array or sequence of numbers
+        """
+        a = numpy.asarray(a, dtype=float).ravel()
+        self._Flush()
+        self.n += len(a)
+        self.levels[0] = numpy.concatenate([self.levels[0], a])
+        self._Compress()
+
+    def Merge(self, other):
+        """Adds the numbers counted by another sketch to this one.
+
+        Args:
+            other: QuantileSketch
+        """
+        self._Flush()
+        other._Flush()
+        while len(self.levels) < len(other.levels):
+            self.levels.append(numpy.zeros(0))
+        for h, level in enumerate(other.levels):
+            self.levels[h] = numpy.concatenate([self.levels[h], level])
+        self.n += other.n
+        self._Compress()
+
+    def MakeCdf(self, name=None):
+        """Makes a Cdf of the numbers counted so far.
+
+        name: string name for the Cdf; by default the sketch's name
+        """
+        if name is None:
+            name = self.name
+        self._Flush()
+        values = numpy.concatenate(self.levels)
+        if len(values) == 0:
+            return Cdf([], [], name)
+        weights = numpy.concatenate([numpy.full(len(level), 2 ** h, numpy.int64)
+                                     for h, level in enumerate(self.levels)])
+        order = numpy.argsort(values, kind='mergesort')
+        values = values[order]
+        cs = numpy.cumsum(weights[order])
+        last = numpy.append(numpy.flatnonzero(numpy.diff(values)),
+                            len(values) - 1)
+        return Cdf(values[last].tolist(), (cs[last] / float(cs[-1])).tolist(),
+                   name)
+
+
 class UnimplementedMethodException(Exception):
     """Exception if someone calls a method that should be overridden."""
 
@@ -1229,6 +1666,244 @@ def MakeSuiteFromCdf(cdf, name=None):
     return suite
 
 
+class Decision(object):
+    """Represents the outcome of a SequentialTest.
+
+    hypo: the accepted hypothesis, or None if the test stopped undecided
+    rule: the stopping rule that fired, or None if the data ran out
+    n: number of observations used
+    suite: posterior Suite when the test stopped
+    """
+
+    def __init__(self, hypo, rule, n, suite=None):
+        self.hypo = hypo
+        self.rule = rule
+        self.n = n
+        self.suite = suite
+
+    def __repr__(self):
+        return 'Decision(%r, %r, %d)' % (self.hypo, self.rule, self.n)
+
+
+class PosteriorThreshold(object):
+    """Stops when the posterior of some hypothesis reaches a threshold.
+
+    With two hypotheses and a threshold of 1-eps, this stops when the other
+    one falls to eps.
+    """
+
+    def __init__(self, threshold):
+        self.threshold = threshold
+
+    def Check(self, test):
+        """Returns a Decision, or None to go on."""
+        log_posts = test.LogPosteriors()
+        i = log_posts.argmax()
+        if log_posts[i] >= math.log(self.threshold):
+            return Decision(test.hypos[i], self, test.n)
+        return None
+
+    def __repr__(self):
+        return 'PosteriorThreshold(%r)' % self.threshold
+
+
+class BayesFactorThreshold(object):
+    """Stops when the likelihood of the data under the most likely
+    hypothesis is at least factor times that under every other one.
+    """
+
+    def __init__(self, factor):
+        self.factor = factor
+
+    def Check(self, test):
+        """Returns a Decision, or None to go on."""
+        log_likes = test.LogLikelihoods()
+        if len(log_likes) < 2:
+            return None
+        second, first = numpy.partition(log_likes, -2)[-2:]
+        if first - second >= math.log(self.factor):
+            return Decision(test.hypos[log_likes.argmax()], self, test.n)
+        return None
+
+    def __repr__(self):
+        return 'BayesFactorThreshold(%r)' % self.factor
+
+
+class WaldBounds(object):
+    """Wald's sequential probability ratio test between two hypotheses.
+
+    Accepts the alternative when the log likelihood ratio reaches
+    log((1-beta) / alpha), and the null when it falls to
+    log(beta / (1-alpha)), so that the error rates are about alpha (type I)
+    and beta (type II).
+    """
+
+    def __init__(self, null, alternative, alpha=0.05, beta=0.05):
+        self.null = null
+        self.alternative = alternative
+        self.alpha = alpha
+        self.beta = beta
+        self.upper = math.log((1 - beta) / float(alpha))
+        self.lower = math.log(beta / (1 - float(alpha)))
+
+    def Check(self, test):
+        """Returns a Decision, or None to go on."""
+        log_likes = test.LogLikelihoods()
+        llr = (log_likes[test.Index(self.alternative)] -
+               log_likes[test.Index(self.null)])
+        if llr >= self.upper:
+            return Decision(self.alternative, self, test.n)
+        if llr <= self.lower:
+            return Decision(self.null, self, test.n)
+        return None
+
+    def __repr__(self):
+        return 'WaldBounds(%r, %r, %r, %r)' % (
+            self.null, self.alternative, self.alpha, self.beta)
+
+
+class MaxSamples(object):
+    """Stops undecided after a number of observations."""
+
+    def __init__(self, n):
+        self.n = n
+
+    def Check(self, test):
+        """Returns a Decision, or None to go on."""
+        if test.n >= self.n:
+            return Decision(None, self, test.n)
+        return None
+
+    def __repr__(self):
+        return 'MaxSamples(%r)' % self.n
+
+
+class SequentialTest(object):
+    """Updates a Suite one observation at a time until a rule says stop.
+
+    The test keeps the log prior and the cumulative log likelihood of every
+    hypothesis in arrays, so an observation costs one likelihood evaluation
+    per hypothesis and a rule check costs O(number of hypotheses), however
+    many observations came before. The suite itself is not modified.
+    """
+
+    def __init__(self, suite, rules, vectorized=False):
+        """Initializes the test.
+
+        suite: Suite with the prior; its LogLikelihood is used if it is
+               implemented, and otherwise the log of its Likelihood
+        rules: sequence of stopping rules, like PosteriorThreshold,
+               BayesFactorThreshold, WaldBounds or MaxSamples; anything
+               with a Check(test) method that returns a Decision or None
+        vectorized: whether the likelihood can be called once with a numpy
+               array of all the hypotheses
+        """
+        self.suite = suite
+        self.rules = list(rules)
+        self.vectorized = vectorized
+        self.hypos = suite.Values()
+        self.index = dict((hypo, i) for i, hypo in enumerate(self.hypos))
+        probs = numpy.array([suite.Prob(hypo) for hypo in self.hypos], float)
+        with numpy.errstate(divide='ignore'):
+            self.log_prior = numpy.log(probs / probs.sum())
+        self.log_likes = numpy.zeros(len(self.hypos))
+        self.n = 0
+        self.use_log = None
+
+    def Index(self, hypo):
+        """Returns the position of hypo in the arrays of the test."""
+        return self.index[hypo]
+
+    def _Evaluate(self, func, data):
+        """Evaluates func(data, hypo) for every hypothesis."""
+        if self.vectorized:
+            values = func(data, numpy.array(self.hypos))
+            return numpy.broadcast_to(values, self.log_likes.shape)
+        return numpy.array([func(data, hypo) for hypo in self.hypos], float)
+
+    def _LogLikelihood(self, data):
+        """Computes the log likelihood of data under every hypothesis."""
+        if self.use_log is None:
+            try:
+                log_likes = self._Evaluate(self.suite.LogLikelihood, data)
+                self.use_log = True
+                return log_likes
+            except UnimplementedMethodException:
+                self.use_log = False
+        if self.use_log:
+            return self._Evaluate(self.suite.LogLikelihood, data)
+        with numpy.errstate(divide='ignore'):
+            return numpy.log(self._Evaluate(self.suite.Likelihood, data))
+
+    def Update(self, data):
+        """Updates with one observation, without checking the rules."""
+        self.log_likes += self._LogLikelihood(data)
+        self.n += 1
+
+    def UpdateSet(self, dataset):
+        """Updates with a sequence of observations, without checking the
+        rules."""
+        for data in dataset:
+            self.Update(data)
+
+    def LogLikelihoods(self):
+        """Returns the array of cumulative log likelihoods."""
+        return self.log_likes
+
+    def LogPosteriors(self):
+        """Returns the array of normalized log posteriors."""
+        log_posts = self.log_prior + self.log_likes
+        return log_posts - scipy.special.logsumexp(log_posts)
+
+    def Posterior(self, name=None):
+        """Returns the posterior as a copy of the suite."""
+        suite = self.suite.Copy(name=name)
+        for hypo, log_post in zip(self.hypos, self.LogPosteriors()):
+            suite.Set(hypo, math.exp(log_post))
+        return suite
+
+    def Check(self):
+        """Checks the rules in order.
+
+        returns: the Decision of the first rule that fires, with the
+                 posterior, or None
+        """
+        for rule in self.rules:
+            decision = rule.Check(self)
+            if decision is not None:
+                decision.suite = self.Posterior()
+                return decision
+        return None
+
+    def Run(self, dataset, block=1):
+        """Updates with observations until a rule fires or the data run out.
+
+        The rules are checked before the first observation and after every
+        block observations.
+
+        dataset: iterable of observations; it is only consumed as far as
+                 needed, so it can be an endless generator
+        block: number of observations between checks
+
+        returns: Decision; if the data run out first, its hypo and rule are
+                 None
+        """
+        decision = self.Check()
+        if decision is not None:
+            return decision
+        for data in dataset:
+            self.Update(data)
+            if self.n % block == 0:
+                decision = self.Check()
+                if decision is not None:
+                    return decision
+        if self.n % block:
+            decision = self.Check()
+            if decision is not None:
+                return decision
+        return Decision(None, None, self.n, self.Posterior())
+
+
 class Pdf(object):
     """Represents a probability density function (PDF)."""
 
@@ -1296,6 +1971,112 @@ class EstimatedPdf(Pdf):
         return pmf
 
 
+class BinnedEstimatedPdf(Pdf):
+    """Represents a PDF estimated by KDE on a regular grid.
+
+    The sample is linearly binned onto a grid and convolved with a
+    Gaussian kernel using the FFT, which takes O(n + g log g) time for
+    n data and g grid points; Density interpolates linearly between
+    grid points.
+
+    The grid spacing and kernel support are chosen so that, for every x,
+    the density differs from the exact Gaussian KDE with the same
+    bandwidth (EstimatedPdf) by at most rtol times the height of one
+    kernel, 1 / (sqrt(2 pi) h):
+
+        binning and interpolation error <= (delta / h)**2 / 4
+        kernel truncation error         <= exp(-cut**2 / 2)
+
+    with delta = h * sqrt(2 * rtol) and cut = sqrt(2 * log(2 / rtol)),
+    so each term contributes at most rtol / 2.
+    """
+
+    def __init__(self, sample, bw_method='scott', rtol=1e-4, gridsize=None):
+        """Estimates the density function based on a sample.
+
+        sample: sequence of data
+        bw_method: 'scott', 'silverman', a scalar factor, or a function
+            that takes the sample and returns a factor; as in
+            scipy.stats.gaussian_kde, the bandwidth is the factor times
+            the standard deviation of the sample
+        rtol: error bound relative to the height of one kernel
+        gridsize: number of grid points; overrides the grid implied by
+            rtol, in which case the error bound no longer holds
+        """
+        sample = numpy.asarray(sample, dtype=float).ravel()
+        n = len(sample)
+        if n < 2:
+            raise ValueError('KDE needs at least two data points')
+        if not 0 < rtol < 1:
+            raise ValueError('rtol must be in the range (0, 1)')
+
+        std = sample.std(ddof=1)
+        if std == 0:
+            raise ValueError('KDE of a sample with zero variance')
+
+        self.factor = self._BandwidthFactor(sample, bw_method)
+        self.bandwidth = h = self.factor * std
+        self.rtol = rtol
+
+        cut = math.sqrt(2 * math.log(2.0 / rtol))
+        low = sample.min() - cut * h
+        high = sample.max() + cut * h
+        if gridsize is None:
+            step = h * math.sqrt(2 * rtol)
+            gridsize = int(math.ceil((high - low) / step)) + 1
+        gridsize = max(gridsize, 3)
+        self.xs, delta = numpy.linspace(low, high, gridsize, retstep=True)
+
+        # linear binning: split each datum between its two grid neighbors
+        pos = (sample - low) / delta
+        index = numpy.minimum(pos.astype(int), gridsize - 2)
+        frac = pos - index
+        counts = (numpy.bincount(index, 1 - frac, minlength=gridsize) +
+                  numpy.bincount(index + 1, frac, minlength=gridsize))
+
+        # kernel on offsets -m..m, stored in wrap-around order
+        m = min(int(math.ceil(cut * h / delta)), gridsize - 1)
+        size = 1
+        while size < gridsize + m:
+            size *= 2
+        offsets = numpy.arange(-m, m + 1) * delta / h
+        kernel = numpy.zeros(size)
+        kernel[numpy.arange(-m, m + 1) % size] = (
+            numpy.exp(-offsets ** 2 / 2) / (math.sqrt(2 * math.pi) * h))
+
+        conv = numpy.fft.irfft(numpy.fft.rfft(counts, size) *
+                               numpy.fft.rfft(kernel), size)
+        self.ps = numpy.maximum(conv[:gridsize] / n, 0)
+
+    @staticmethod
+    def _BandwidthFactor(sample, bw_method):
+        """Computes the bandwidth factor, as in scipy.stats.gaussian_kde."""
+        n = len(sample)
+        if bw_method == 'scott':
+            return n ** -0.2
+        if bw_method == 'silverman':
+            return (n * 0.75) ** -0.2
+        if callable(bw_method):
+            return float(bw_method(sample))
+        if numpy.isscalar(bw_method) and not isinstance(bw_method, str):
+            return float(bw_method)
+        raise ValueError('Unknown bandwidth rule %s' % repr(bw_method))
+
+    def Density(self, x):
+        """Evaluates this Pdf at x.
+
+        x: number or array
+
+        Returns: float probability density, or array of densities
+        """
+        return numpy.interp(x, self.xs, self.ps, left=0.0, right=0.0)
+
+    def MakePmf(self, xs, name=''):
+        ps = self.Density(xs)
+        pmf = MakePmfFromItems(zip(xs, ps), name=name)
+        return pmf
+
+
 def Percentile(pmf, percentage):
     """Computes a percentile of a given Pmf.
 
@@ -1404,6 +2185,123 @@ def SampleSum(dists, n):
     return pmf
 
 
+def _SimulateBlock(task):
+    """Runs one block of replicates for Simulate.
+
+    task: tuple of (replicate, seed, index, size, vectorized)
+
+    returns: tuple of (index, size, map from value to count)
+    """
+    replicate, seed, index, size, vectorized = task
+    rng = numpy.random.RandomState([seed, index])
+    # seed the global generators too, for replicates like RandomSum that
+    # use them
+    random.seed(rng.randint(1 << 30))
+    numpy.random.seed(rng.randint(1 << 30))
+
+    if vectorized:
+        values, counts = numpy.unique(replicate(rng, size),
+                                      return_counts=True)
+        return index, size, dict(zip(values.tolist(), counts.tolist()))
+
+    counts = {}
+    for _ in xrange(size):
+        value = replicate(rng)
+        counts[value] = counts.get(value, 0) + 1
+    return index, size, counts
+
+
+def _LogProgress(done, total, elapsed):
+    """Logs the progress of Simulate."""
+    logging.info('%d of %d replicates in %.1f s (%.0f per second)',
+                 done, total, elapsed, done / max(elapsed, 1e-9))
+
+
+def Simulate(replicate, n, seed=0, processes=None, block=1000,
+             vectorized=False, progress=_LogProgress, interval=1.0, name='',
+             hist=None):
+    """Runs replicates of a simulation in parallel and counts the results.
+
+    The replicates are split into blocks of a fixed size, and block i
+    draws from numpy.random.RandomState([seed, i]), which is also used
+    to seed the global random and numpy.random generators before the
+    block runs.  The counts are added to hist block by block, in order,
+    whichever block finishes first.  So the result depends only on seed
+    and block, not on the number of processes, and the same arguments
+    give the same Hist every time.  That holds for any hist that does
+    not draw random numbers of its own, like Hist and StreamingHist, and
+    for a QuantileSketch with a fixed seed, as by default.
+
+    Blocks run on a multiprocessing pool, so replicate must be picklable,
+    which means a function defined at the top level of a module.
+
+    replicate: function that takes a numpy RandomState and returns a
+               hashable value; if vectorized, it takes a RandomState and
+               a size and returns an array of that many values
+    n: number of replicates
+    seed: int seed
+    processes: size of the process pool; 1 runs in this process, and None
+               uses every CPU
+    block: number of replicates per block
+    vectorized: whether replicate makes a whole block at once
+    progress: function called with (done, n, elapsed seconds) as blocks
+              finish, at most once per interval seconds and once at the
+              end; None to stay quiet
+    interval: seconds between calls to progress
+    name: string name for the Hist
+    hist: where to count the values, anything with an Incr(value, count)
+          method, like a StreamingHist or QuantileSketch for runs too
+          long to keep every distinct value; a new Hist by default
+
+    returns: hist, with the values counted
+    """
+    tasks = [(replicate, seed, i, min(block, n - first), vectorized)
+             for i, first in enumerate(xrange(0, n, block))]
+
+    if processes == 1:
+        # keep the caller's global generators as they were
+        pool = None
+        states = random.getstate(), numpy.random.get_state()
+        results = itertools.imap(_SimulateBlock, tasks)
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap(_SimulateBlock, tasks)
+
+    if hist is None:
+        hist = Hist(name=name)
+    start = time.time()
+    last = start
+    done = 0
+    try:
+        for _, size, counts in results:
+            # in a fixed order, since dict order can differ after pickling
+            for value, count in sorted(counts.iteritems()):
+                hist.Incr(value, count)
+            done += size
+            now = time.time()
+            if progress is not None and now - last >= interval:
+                progress(done, n, now - start)
+                last = now
+    except BaseException:
+        # stop the remaining blocks rather than wait for them
+        if pool is not None:
+            pool.terminate()
+        raise
+    else:
+        if pool is not None:
+            pool.close()
+    finally:
+        if pool is None:
+            random.setstate(states[0])
+            numpy.random.set_state(states[1])
+        else:
+            pool.join()
+
+    if progress is not None:
+        progress(done, n, time.time() - start)
+    return hist
+
+
 def EvalGaussianPdf(x, mu, sigma):
     """Computes the unnormalized PDF of the normal distribution.
 
@@ -1441,9 +2339,31 @@ def EvalBinomialPmf(k, n, p):
     """Evaluates the binomial pmf.
 
     Returns the probabily of k successes in n trials with probability p.
+    Broadcasts over arrays of k, n and p.
     """
-    return scipy.stats.binom.pmf(k, n, p)
-    
+    return numpy.exp(EvalBinomialLogPmf(k, n, p))
+
+
+def EvalBinomialLogPmf(k, n, p):
+    """Evaluates the log of the binomial pmf.
+
+    Broadcasts over arrays of k, n and p; for example, pass a column of
+    hypotheses p[:, None] and a row of data k[None, :] to get a matrix
+    of log likelihoods.
+
+    k: number of successes
+    n: number of trials
+    p: probability of success
+
+    returns: float log probability, or array; -inf where k is out of range
+    """
+    k = numpy.asarray(k)
+    n = numpy.asarray(n)
+    k0 = numpy.clip(k, 0, n)
+    res = (LogBinomialCoef(n, k0) +
+           scipy.special.xlogy(k0, p) + scipy.special.xlog1py(n - k0, -p))
+    return numpy.where(k != k0, -numpy.inf, res)[()]
+
 
 def EvalPoissonPmf(k, lam):
     """Computes the Poisson PMF.
@@ -1451,13 +2371,69 @@ def EvalPoissonPmf(k, lam):
     k: number of events
     lam: parameter lambda in events per unit time
 
+    Broadcasts over arrays of k and lam.
+
     returns: float probability
     """
-    # don't use the scipy function.  for lam=0 it returns NaN;
-    # should be 0.0
-    return scipy.stats.poisson.pmf(k, lam)
+    return numpy.exp(EvalPoissonLogPmf(k, lam))
+
+
+def EvalPoissonLogPmf(k, lam):
+    """Computes the log of the Poisson PMF.
+
+    Unlike scipy.stats.poisson, lam=0 is allowed: the pmf is 1 at k=0
+    and 0 elsewhere.  Broadcasts over arrays of k and lam.
+
+    k: number of events
+    lam: parameter lambda in events per unit time
+
+    returns: float log probability, or array
+    """
+    k = numpy.asarray(k)
+    res = scipy.special.xlogy(k, lam) - lam - LogFactorial(numpy.maximum(k, 0))
+    return numpy.where(k < 0, -numpy.inf, res)[()]
+
+
+def EvalNegativeBinomialLogPmf(k, r, p):
+    """Computes the log of the negative binomial PMF.
+
+    Probability of k failures before the rth success, where each trial
+    succeeds with probability p, as in scipy.stats.nbinom.  r need not
+    be an integer.  Broadcasts over arrays of k, r and p.
+
+    k: number of failures
+    r: number of successes
+    p: probability of success
+
+    returns: float log probability, or array
+    """
+    k = numpy.asarray(k)
+    k0 = numpy.maximum(k, 0)
+    res = (scipy.special.gammaln(k0 + r) - scipy.special.gammaln(r) -
+           LogFactorial(k0) +
+           scipy.special.xlogy(r, p) + scipy.special.xlog1py(k0, -p))
+    return numpy.where(k < 0, -numpy.inf, res)[()]
+
 
-    #return lam ** k * math.exp(-lam) / math.factorial(k)
+def EvalMultinomialLogPmf(xs, ps):
+    """Computes the log of the multinomial PMF.
+
+    The categories run along the last axis of xs and ps; the other axes
+    broadcast, so xs[:, None, :] and ps[None, :, :] give a matrix of log
+    likelihoods for each datum and hypothesis.
+
+    xs: counts in each category
+    ps: probability of each category
+
+    returns: float log probability, or array
+    """
+    xs = numpy.asarray(xs)
+    if numpy.any(xs < 0):
+        raise ValueError('Multinomial counts must be non-negative')
+    n = xs.sum(axis=-1)
+    res = (LogFactorial(n) - LogFactorial(xs).sum(axis=-1) +
+           scipy.special.xlogy(xs, ps).sum(axis=-1))
+    return res[()]
 
 
 def MakePoissonPmf(lam, high, step=1):
@@ -1469,8 +2445,8 @@ def MakePoissonPmf(lam, high, step=1):
     returns: normalized Pmf
     """
     pmf = Pmf()
-    for k in xrange(0, high + 1, step):
-        p = EvalPoissonPmf(k, lam)
+    ks = range(0, high + 1, step)
+    for k, p in zip(ks, EvalPoissonPmf(ks, lam)):
         pmf.Set(k, p)
     pmf.Normalize()
     return pmf
@@ -1479,17 +2455,26 @@ def MakePoissonPmf(lam, high, step=1):
 def EvalExponentialPdf(x, lam):
     """Computes the exponential PDF.
 
+    Broadcasts over arrays of x and lam.
+
     x: value
     lam: parameter lambda in events per unit time
 
-    returns: float probability density
+    returns: float probability density, or array of densities
     """
-    return lam * math.exp(-lam * x)
+    x = numpy.asarray(x, dtype=float)
+    # clip x so that the masked negative values cannot overflow exp
+    return numpy.where(x < 0, 0.0,
+                       lam * numpy.exp(-lam * numpy.maximum(x, 0)))[()]
 
 
 def EvalExponentialCdf(x, lam):
-    """Evaluates CDF of the exponential distribution with parameter lam."""
-    return 1 - math.exp(-lam * x)
+    """Evaluates CDF of the exponential distribution with parameter lam.
+
+    Broadcasts over arrays of x and lam.
+    """
+    x = numpy.asarray(x, dtype=float)
+    return numpy.where(x < 0, 0.0, -numpy.expm1(-lam * x))[()]
 
 
 def MakeExponentialPmf(lam, high, n=200):
@@ -1509,35 +2494,37 @@ def MakeExponentialPmf(lam, high, n=200):
     return pmf
 
 
-def StandardGaussianCdf(x, root2=math.sqrt(2)):
+def StandardGaussianCdf(x):
     """Evaluates the CDF of the standard Gaussian distribution.
     
     See http://en.wikipedia.org/wiki/Normal_distribution
     #Cumulative_distribution_function
 
     Args:
-        x: float
+        x: float or array
                 
     Returns:
-        float
+        float or array
     """
-    return (erf(x / root2) + 1) / 2
+    return ndtr(x)
 
 
 def GaussianCdf(x, mu=0, sigma=1):
     """Evaluates the CDF of the gaussian distribution.
+
+    Broadcasts over arrays of x, mu and sigma.
     
     Args:
-        x: float
+        x: float or array
 
         mu: mean parameter
         
         sigma: standard deviation parameter
                 
     Returns:
-        float
+        float or array
     """
-    return StandardGaussianCdf(float(x - mu) / sigma)
+    return ndtr((numpy.asarray(x, dtype=float) - mu) / sigma)
 
 
 def GaussianCdfInverse(p, mu=0, sigma=1):
@@ -1545,18 +2532,19 @@ def GaussianCdfInverse(p, mu=0, sigma=1):
 
     See http://en.wikipedia.org/wiki/Normal_distribution#Quantile_function  
 
+    Broadcasts over arrays of p, mu and sigma.
+
     Args:
-        p: float
+        p: float or array
 
         mu: mean parameter
         
         sigma: standard deviation parameter
                 
     Returns:
-        float
+        float or array
     """
-    x = root2 * erfinv(2 * p - 1)
-    return mu + x * sigma
+    return mu + ndtri(p) * numpy.asarray(sigma, dtype=float)
 
 
 class Beta(object):
@@ -1718,24 +2706,72 @@ class Dirichlet(object):
 def BinomialCoef(n, k):
     """Compute the binomial coefficient "n choose k".
 
+    Broadcasts over arrays of n and k.
+
     n: number of trials
     k: number of successes
 
     Returns: float
     """
-    return scipy.misc.comb(n, k)
+    return scipy.special.comb(n, k)
 
 
 def LogBinomialCoef(n, k):
     """Computes the log of the binomial coefficient.
 
-    http://math.stackexchange.com/questions/64716/
-    approximating-the-logarithm-of-the-binomial-coefficient
+    Exact for integers (up to floating-point rounding); -inf if k < 0
+    or k > n.  Broadcasts over arrays of n and k.
 
     n: number of trials
     k: number of successes
 
     Returns: float
     """
-    return n * log(n) - k * log(k) - (n - k) * log(n - k)
+    n = numpy.asarray(n)
+    k = numpy.asarray(k)
+    valid = (k >= 0) & (k <= n)
+    k0 = numpy.where(valid, k, 0)
+    n0 = numpy.where(valid, n, 0)
+    res = LogFactorial(n0) - LogFactorial(k0) - LogFactorial(n0 - k0)
+    return numpy.where(valid, res, -numpy.inf)[()]
+
 
+# table of log(n!) for n < len(_log_factorials), grown as needed
+_log_factorials = numpy.zeros(1)
+
+# beyond this size, LogFactorial uses gammaln instead of the table
+MAX_LOG_FACTORIAL_TABLE = 1 << 20
+
+
+def LogFactorial(n):
+    """Computes log(n!).
+
+    Integers are looked up in a table that grows to cover the largest
+    n seen so far, up to MAX_LOG_FACTORIAL_TABLE; other values use
+    gammaln.  Broadcasts over arrays.
+
+    n: non-negative number or array
+
+    Returns: float or array
+    """
+    global _log_factorials
+
+    n = numpy.asarray(n)
+    if n.dtype.kind == 'b':
+        # index the table with 0 and 1, not with a mask
+        n = n.astype(int)
+    if n.size == 0:
+        return n.astype(float)
+    if numpy.any(n < 0):
+        raise ValueError('LogFactorial of a negative number')
+
+    high = n.max()
+    if n.dtype.kind not in 'iu' or high >= MAX_LOG_FACTORIAL_TABLE:
+        return scipy.special.gammaln(n + 1.0)[()]
+
+    size = len(_log_factorials)
+    if high >= size:
+        size = min(max(high + 1, 2 * size), MAX_LOG_FACTORIAL_TABLE)
+        _log_factorials = scipy.special.gammaln(numpy.arange(size) + 1.0)
+
+    return _log_factorials[n][()]
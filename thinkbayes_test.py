@@ -0,0 +1,488 @@
+"""
+Test file for thinkbayes.py
+"""
+import math
+import random
+import unittest
+
+import numpy
+import scipy.special
+import scipy.stats
+
+import thinkbayes
+from thinkbayes import RandomSum
+
+
+class CoinSuite(thinkbayes.Suite):
+
+    def Likelihood(self, data, hypo):
+        return hypo if data else 1 - hypo
+
+
+def SumOfDice(rng):
+    return RandomSum([thinkbayes.MakePmfFromList(range(1, 7))] * 2)
+
+
+def RoundedGaussians(rng, size):
+    return numpy.round(rng.normal(0, 1, size), 1)
+
+
+def FailingReplicate(rng):
+    raise ValueError('replicate failed')
+
+
+class ThinkBayesTest(unittest.TestCase):
+
+    def assertArrayClose(self, a, b, rtol=1e-12, atol=1e-300):
+        """Tests that two arrays are elementwise close."""
+        self.assertEqual(numpy.shape(a), numpy.shape(b))
+        self.assertTrue(numpy.allclose(a, b, rtol=rtol, atol=atol),
+                        '%s != %s' % (a, b))
+
+    def test_copy_on_write(self):
+        writes = [
+            lambda pmf: pmf.Set(1, 0.9),
+            lambda pmf: pmf.Incr(4, 0.5),
+            lambda pmf: pmf.Mult(2, 3),
+            lambda pmf: pmf.Remove(3),
+            lambda pmf: pmf.Normalize(2),
+        ]
+        original = {1: 0.2, 2: 0.3, 3: 0.5}
+        for write in writes:
+            # writing to the parent leaves the copy alone, and vice versa
+            pmf = thinkbayes.Pmf(original)
+            other = pmf.Copy()
+            write(pmf)
+            self.assertEqual(other.d, original)
+            self.assertNotEqual(pmf.d, original)
+
+            pmf = thinkbayes.Pmf(original)
+            other = pmf.Copy()
+            write(other)
+            self.assertEqual(pmf.d, original)
+            self.assertNotEqual(other.d, original)
+
+        # a chain of copies
+        pmf = thinkbayes.Pmf(original)
+        copies = [pmf]
+        for i in range(3):
+            copies.append(copies[-1].Copy(name=str(i)))
+        copies[1].Set(1, 0)
+        copies[3].Incr(2, 1)
+        self.assertEqual(copies[0].d, original)
+        self.assertEqual(copies[2].d, original)
+        self.assertEqual(copies[1].Prob(1), 0)
+        self.assertEqual(copies[3].Prob(2), 1.3)
+        self.assertEqual(copies[3].name, '2')
+
+        # Scale makes a new dictionary
+        scaled = pmf.Scale(10)
+        self.assertEqual(pmf.d, original)
+        self.assertEqual(scaled.d, {10: 0.2, 20: 0.3, 30: 0.5})
+
+        # updating a copy of a Suite
+        suite = CoinSuite([0.5, 0.7])
+        other = suite.Copy()
+        other.Update(1)
+        self.assertEqual(suite.Prob(0.7), 0.5)
+        self.assertAlmostEqual(other.Prob(0.7), 0.7 / 1.2)
+
+        # writes through the dictionary from GetDict do not reach copies
+        pmf = thinkbayes.Pmf(original)
+        d = pmf.GetDict()
+        other = pmf.Copy()
+        d[2] = 5
+        self.assertEqual(other.d, original)
+        self.assertEqual(pmf.Prob(2), 5)
+        d = other.GetDict()
+        d[1] = 7
+        self.assertEqual(pmf.Prob(1), 0.2)
+
+    def test_interpolator(self):
+        # uniform grid: below, on and between grid points, and above
+        xs = numpy.linspace(0, 2, 21)
+        ys = xs ** 2
+        interp = thinkbayes.Interpolator(list(xs), list(ys))
+        self.assertTrue(interp.forward[3] is not None)
+        queries = numpy.concatenate([[-1, -1e-12, 2 + 1e-12, 3], xs,
+                                     numpy.linspace(-0.5, 2.5, 997)])
+        self.assertArrayClose(interp.Lookup(queries),
+                              numpy.interp(queries, xs, ys))
+        self.assertArrayClose(interp.Reverse(queries),
+                              numpy.interp(queries, ys, xs))
+        for x in [-1, 0, 0.1, 0.55, 1.3, 2, 5]:
+            self.assertTrue(isinstance(interp.Lookup(x), float))
+            self.assertAlmostEqual(interp.Lookup(x), numpy.interp(x, xs, ys))
+        self.assertAlmostEqual(interp.Lookup(xs[3]), ys[3], places=15)
+        self.assertAlmostEqual(interp.Reverse(ys[7]), xs[7], places=15)
+        self.assertEqual(interp.Lookup(2), 4)
+
+        # non-uniform grid, with a repeated x
+        xs = numpy.array([0, 0.1, 0.5, 0.5, 2, 7])
+        ys = numpy.array([1, 2, 3, 4, 8, 9])
+        interp = thinkbayes.Interpolator(xs, ys)
+        self.assertTrue(interp.forward[3] is None)
+        queries = numpy.linspace(-1, 8, 1001)
+        self.assertArrayClose(interp.Lookup(queries),
+                              numpy.interp(queries, xs, ys))
+        self.assertArrayClose(interp.Reverse(queries),
+                              numpy.interp(queries, ys, xs))
+        self.assertAlmostEqual(interp.Reverse(8.5), 4.5)
+
+        self.assertRaises(ValueError, thinkbayes.Interpolator, [1, 0], [0, 1])
+        self.assertRaises(ValueError, thinkbayes.Interpolator, [], [])
+        self.assertRaises(ValueError, thinkbayes.Interpolator, [0, 1], [0])
+        interp = thinkbayes.Interpolator([0, 1, 2], [0, 1, 0])
+        self.assertEqual(interp.Lookup(1.5), 0.5)
+        self.assertRaises(ValueError, interp.Reverse, 0.5)
+
+    def test_binned_estimated_pdf(self):
+        rng = numpy.random.RandomState(2)
+        sample = numpy.concatenate([rng.normal(0, 1, 700),
+                                    rng.normal(5, 0.5, 300)])
+        xs = numpy.linspace(-6, 10, 2001)
+
+        # within rtol of one kernel height of the exact KDE
+        for rtol in (1e-4, 1e-6):
+            pdf = thinkbayes.BinnedEstimatedPdf(sample, rtol=rtol)
+            exact = thinkbayes.EstimatedPdf(sample).Density(xs)
+            bound = rtol / (math.sqrt(2 * math.pi) * pdf.bandwidth)
+            self.assertTrue(numpy.abs(pdf.Density(xs) - exact).max() < bound)
+        self.assertAlmostEqual(pdf.Density(0.3),
+                               pdf.Density(numpy.array([0.3]))[0])
+        self.assertEqual(pdf.Density(100), 0)
+
+        # bandwidth rules agree with gaussian_kde
+        rules = [('scott', 'scott'), ('silverman', 'silverman'), (0.3, 0.3),
+                 (lambda s: 0.1 * s.std(),
+                  lambda kde: 0.1 * kde.dataset.std())]
+        for rule, kde_rule in rules:
+            pdf = thinkbayes.BinnedEstimatedPdf(sample, bw_method=rule)
+            kde = scipy.stats.gaussian_kde(sample, bw_method=kde_rule)
+            self.assertAlmostEqual(pdf.factor, kde.factor)
+            self.assertAlmostEqual(pdf.bandwidth,
+                                   kde.factor * sample.std(ddof=1))
+            bound = pdf.rtol / (math.sqrt(2 * math.pi) * pdf.bandwidth)
+            self.assertTrue(numpy.abs(pdf.Density(xs) -
+                                      kde.evaluate(xs)).max() < bound)
+        self.assertRaises(ValueError, thinkbayes.BinnedEstimatedPdf, sample,
+                          bw_method='unknown')
+
+        # gridsize overrides the grid implied by rtol
+        pdf = thinkbayes.BinnedEstimatedPdf(sample, gridsize=64)
+        self.assertEqual(len(pdf.xs), 64)
+        self.assertEqual(len(pdf.ps), 64)
+        pmf = pdf.MakePmf(xs)
+        self.assertAlmostEqual(pmf.Total(), 1)
+
+        self.assertRaises(ValueError, thinkbayes.BinnedEstimatedPdf, [1.0])
+        self.assertRaises(ValueError, thinkbayes.BinnedEstimatedPdf,
+                          [2.0, 2.0, 2.0])
+        for rtol in (0, 1, -0.1):
+            self.assertRaises(ValueError, thinkbayes.BinnedEstimatedPdf,
+                              sample, rtol=rtol)
+
+    def test_gaussian_cdf(self):
+        xs = numpy.linspace(-30, 30, 1001)
+        self.assertArrayClose(thinkbayes.StandardGaussianCdf(xs),
+                              scipy.stats.norm.cdf(xs))
+        self.assertAlmostEqual(thinkbayes.StandardGaussianCdf(0), 0.5)
+
+        # broadcast x against a column of mus and a row of sigmas
+        mus = numpy.array([[-1.0], [0.0], [2.5]])
+        sigmas = numpy.array([0.5, 1.0, 3.0])
+        self.assertArrayClose(thinkbayes.GaussianCdf(1, mus, sigmas),
+                              scipy.stats.norm.cdf(1, mus, sigmas))
+        self.assertArrayClose(thinkbayes.GaussianCdf(xs, 1, 2),
+                              scipy.stats.norm.cdf(xs, 1, 2))
+        self.assertAlmostEqual(thinkbayes.GaussianCdf(3, 3, 2), 0.5)
+
+    def test_gaussian_cdf_inverse(self):
+        ps = numpy.array([1e-300, 1e-12, 0.01, 0.3, 0.5, 0.9, 1 - 1e-12])
+        self.assertArrayClose(thinkbayes.GaussianCdfInverse(ps),
+                              scipy.stats.norm.ppf(ps))
+        self.assertArrayClose(thinkbayes.GaussianCdfInverse(ps, 10, 3),
+                              scipy.stats.norm.ppf(ps, 10, 3))
+        self.assertAlmostEqual(thinkbayes.GaussianCdfInverse(0.5, 2, 7), 2)
+
+        xs = numpy.linspace(-5, 5, 11)
+        ps = thinkbayes.GaussianCdf(xs, 1, 2)
+        self.assertArrayClose(thinkbayes.GaussianCdfInverse(ps, 1, 2), xs,
+                              rtol=1e-9, atol=1e-9)
+
+    def test_exponential(self):
+        xs = numpy.linspace(-1, 50, 1001)
+        lams = numpy.array([[0.1], [1.0], [4.0]])
+        self.assertArrayClose(thinkbayes.EvalExponentialPdf(xs, lams),
+                              scipy.stats.expon.pdf(xs, scale=1 / lams))
+        self.assertArrayClose(thinkbayes.EvalExponentialCdf(xs, lams),
+                              scipy.stats.expon.cdf(xs, scale=1 / lams))
+
+        # small x, where 1 - exp(-x) loses precision
+        self.assertArrayClose(thinkbayes.EvalExponentialCdf(1e-20, 2.0),
+                              2e-20)
+        self.assertEqual(thinkbayes.EvalExponentialPdf(-1, 2.0), 0)
+        with numpy.errstate(over='raise'):
+            self.assertEqual(thinkbayes.EvalExponentialPdf(-1e6, 2.0), 0)
+        self.assertAlmostEqual(thinkbayes.EvalExponentialPdf(0, 2.0), 2.0)
+
+    def test_log_factorial(self):
+        ns = numpy.arange(0, 200)
+        self.assertArrayClose(thinkbayes.LogFactorial(ns),
+                              scipy.special.gammaln(ns + 1))
+        self.assertEqual(thinkbayes.LogFactorial(0), 0)
+        self.assertAlmostEqual(thinkbayes.LogFactorial(2.5),
+                               scipy.special.gammaln(3.5))
+        self.assertRaises(ValueError, thinkbayes.LogFactorial, -1)
+        self.assertArrayClose(
+            thinkbayes.LogFactorial(numpy.array([True, False, True])),
+            numpy.zeros(3))
+        self.assertArrayClose(thinkbayes.LogFactorial(numpy.ones(300, bool)),
+                              numpy.zeros(300))
+
+    def test_log_binomial_coef(self):
+        self.assertEqual(thinkbayes.LogBinomialCoef(5, 0), 0)
+        self.assertEqual(thinkbayes.LogBinomialCoef(5, 5), 0)
+        self.assertAlmostEqual(thinkbayes.LogBinomialCoef(5, 2),
+                               numpy.log(10))
+        self.assertEqual(thinkbayes.LogBinomialCoef(5, 6), -numpy.inf)
+        self.assertEqual(thinkbayes.BinomialCoef(5, 2), 10)
+
+    def test_binomial_pmf(self):
+        ks = numpy.arange(-1, 22)
+        ps = numpy.array([[0.0], [0.01], [0.3], [0.5], [0.99], [1.0]])
+        self.assertArrayClose(thinkbayes.EvalBinomialLogPmf(ks, 20, ps),
+                              scipy.stats.binom.logpmf(ks, 20, ps),
+                              rtol=1e-10)
+        self.assertArrayClose(thinkbayes.EvalBinomialPmf(ks, 20, ps),
+                              scipy.stats.binom.pmf(ks, 20, ps), rtol=1e-10)
+
+    def test_poisson_pmf(self):
+        ks = numpy.arange(-1, 50)
+        lams = numpy.array([[0.1], [1.0], [7.5], [30.0]])
+        self.assertArrayClose(thinkbayes.EvalPoissonLogPmf(ks, lams),
+                              scipy.stats.poisson.logpmf(ks, lams),
+                              rtol=1e-10)
+
+        # scipy returns nan for lam=0
+        self.assertEqual(thinkbayes.EvalPoissonPmf(0, 0), 1)
+        self.assertEqual(thinkbayes.EvalPoissonPmf(3, 0), 0)
+
+    def test_negative_binomial_pmf(self):
+        ks = numpy.arange(-1, 40)
+        rs = numpy.array([[1], [2.5], [10]])
+        self.assertArrayClose(
+            thinkbayes.EvalNegativeBinomialLogPmf(ks, rs, 0.3),
+            scipy.stats.nbinom.logpmf(ks, rs, 0.3), rtol=1e-10)
+
+    def test_multinomial_pmf(self):
+        xs = numpy.array([[1, 2, 3], [0, 0, 6], [2, 2, 2]])
+        ps = numpy.array([[0.2, 0.3, 0.5], [0.1, 0.1, 0.8]])
+        res = thinkbayes.EvalMultinomialLogPmf(xs[:, None, :], ps[None, :, :])
+        self.assertEqual(res.shape, (3, 2))
+        for i, x in enumerate(xs):
+            for j, p in enumerate(ps):
+                self.assertAlmostEqual(
+                    res[i, j], scipy.stats.multinomial.logpmf(x, 6, p))
+
+    def test_make_from_array(self):
+        a = numpy.array([3, 1, 2, 1, 3, 3])
+        t = [3, 1, 2, 1, 3, 3]
+        self.assertEqual(thinkbayes.MakeHistFromArray(a).GetDict(),
+                         thinkbayes.MakeHistFromList(t).GetDict())
+        pmf = thinkbayes.MakePmfFromArray(a)
+        for x, p in thinkbayes.MakePmfFromList(t).Items():
+            self.assertAlmostEqual(pmf.Prob(x), p)
+        cdf = thinkbayes.MakeCdfFromArray(a)
+        self.assertEqual(cdf.xs, [1, 2, 3])
+        self.assertArrayClose(cdf.ps, thinkbayes.MakeCdfFromList(t).ps)
+        self.assertEqual(len(thinkbayes.MakeCdfFromArray([]).xs), 0)
+
+    def test_sequential_test(self):
+        flips = [1, 1, 0, 1, 1, 1, 0, 1, 1, 1, 1, 1] * 10
+
+        # A posterior threshold stops where repeated Updates cross it
+        suite = CoinSuite([0.5, 0.7])
+        rule = thinkbayes.PosteriorThreshold(0.99)
+        decision = thinkbayes.SequentialTest(suite, [rule]).Run(iter(flips))
+        expected = suite.Copy()
+        for n, flip in enumerate(flips):
+            expected.Update(flip)
+            if expected.Prob(0.7) >= 0.99:
+                break
+        self.assertEqual(decision.n, n + 1)
+        self.assertEqual(decision.hypo, 0.7)
+        self.assertTrue(decision.rule is rule)
+        self.assertAlmostEqual(decision.suite.Prob(0.7), expected.Prob(0.7))
+        self.assertEqual(suite.Prob(0.5), 0.5)
+        self.assertTrue(isinstance(decision.suite, CoinSuite))
+
+        # Wald bounds on the log likelihood ratio
+        rule = thinkbayes.WaldBounds(0.5, 0.7, alpha=0.01, beta=0.01)
+        decision = thinkbayes.SequentialTest(suite, [rule],
+                                             vectorized=True).Run(flips)
+        llr = numpy.cumsum([math.log(0.7 / 0.5) if f else math.log(0.3 / 0.5)
+                            for f in flips])
+        self.assertEqual(decision.n,
+                         numpy.flatnonzero(llr >= math.log(99)).min() + 1)
+        self.assertEqual(decision.hypo, 0.7)
+
+        # Bayes factors ignore the prior; rules are checked every block
+        suite = CoinSuite({0.5: 0.999, 0.7: 0.001})
+        test = thinkbayes.SequentialTest(
+            suite, [thinkbayes.BayesFactorThreshold(99),
+                    thinkbayes.MaxSamples(30)])
+        decision = test.Run(flips, block=5)
+        self.assertEqual(decision.n, 25)
+        self.assertEqual(decision.hypo, 0.7)
+
+        # Stopping undecided
+        test = thinkbayes.SequentialTest(suite, [thinkbayes.MaxSamples(3)])
+        self.assertEqual(test.Run(flips).hypo, None)
+        test = thinkbayes.SequentialTest(suite, [])
+        decision = test.Run(flips[:4])
+        self.assertEqual((decision.hypo, decision.rule, decision.n),
+                         (None, None, 4))
+
+    def test_simulate(self):
+        reports = []
+        progress = lambda *args: reports.append(args)
+        state = random.getstate()
+        hist = thinkbayes.Simulate(SumOfDice, 2500, seed=3, processes=1,
+                                   block=300, progress=progress)
+        self.assertEqual(random.getstate(), state)
+        self.assertEqual(hist.Total(), 2500)
+        self.assertTrue(set(hist.Values()) <= set(range(2, 13)))
+        self.assertEqual(reports[-1][:2], (2500, 2500))
+
+        # the same seed gives the same counts, whatever the pool size
+        for processes in (1, 2):
+            other = thinkbayes.Simulate(SumOfDice, 2500, seed=3,
+                                        processes=processes, block=300,
+                                        progress=None)
+            self.assertEqual(other.GetDict(), hist.GetDict())
+        other = thinkbayes.Simulate(SumOfDice, 2500, seed=4, processes=1,
+                                    block=300, progress=None)
+        self.assertNotEqual(other.GetDict(), hist.GetDict())
+
+        hist = thinkbayes.Simulate(RoundedGaussians, 10000, seed=1,
+                                   processes=2, block=1000,
+                                   vectorized=True, progress=None)
+        self.assertEqual(hist.Total(), 10000)
+        pmf = thinkbayes.MakePmfFromHist(hist)
+        self.assertTrue(abs(pmf.Mean()) < 0.05)
+
+        # errors in replicates come back to the caller
+        state = random.getstate()
+        for processes in (1, 2):
+            self.assertRaises(ValueError, thinkbayes.Simulate,
+                              FailingReplicate, 2000, processes=processes,
+                              block=100, progress=None)
+        self.assertEqual(random.getstate(), state)
+
+        # sketches are reproducible too, since blocks are counted in order
+        cdfs = []
+        for processes in (1, 1, 2):
+            sketch = thinkbayes.Simulate(RoundedGaussians, 10000, seed=1,
+                                         processes=processes, block=1000,
+                                         vectorized=True, progress=None,
+                                         hist=thinkbayes.QuantileSketch(k=20))
+            self.assertEqual(sketch.Total(), 10000)
+            cdfs.append(sketch.MakeCdf().Items())
+        self.assertEqual(cdfs[0], cdfs[1])
+        self.assertEqual(cdfs[0], cdfs[2])
+
+    def test_streaming_hist(self):
+        rng = numpy.random.RandomState(0)
+        ts = rng.poisson(20, 1000)
+
+        # integers are counted exactly by default
+        hist = thinkbayes.StreamingHist()
+        for t in ts[:500]:
+            hist.Incr(t)
+        hist.IncrArray(ts[500:])
+        self.assertEqual(hist.GetDict(),
+                         thinkbayes.MakeHistFromArray(ts).GetDict())
+
+        # adaptive bins double in width, and keep every value counted
+        xs = rng.normal(0, 10, 10000)
+        hist = thinkbayes.StreamingHist(width=0.01, origin=0, max_bins=50)
+        hist.IncrArray(xs[:5000])
+        for x in xs[5000:5100]:
+            hist.Incr(x)
+        self.assertTrue(len(hist) <= 50)
+        self.assertEqual(hist.Total(), 5100)
+        self.assertEqual(math.frexp(hist.width / 0.01)[0], 0.5)
+        for x, freq in hist.Items():
+            low = x - hist.width / 2
+            inside = (low <= xs[:5100]) & (xs[:5100] < low + hist.width)
+            self.assertEqual(freq, inside.sum())
+
+        # merging equals counting everything in one histogram
+        other = thinkbayes.StreamingHist(width=0.01, origin=0, max_bins=50)
+        other.IncrArray(xs[5100:])
+        hist.Merge(other)
+        expected = thinkbayes.StreamingHist(width=0.01, origin=0, max_bins=50)
+        expected.IncrArray(xs)
+        self.assertEqual(hist.width, expected.width)
+        self.assertEqual(hist.GetDict(), expected.GetDict())
+
+        # weighted counts survive IncrArray and Merge
+        hist = thinkbayes.StreamingHist()
+        hist.Incr(1, 0.5)
+        hist.IncrArray([1, 2])
+        self.assertEqual(hist.GetDict(), {1: 1.5, 2: 1})
+        other = thinkbayes.StreamingHist()
+        other.Incr(2, 0.25)
+        hist.Merge(other)
+        self.assertEqual(hist.GetDict(), {1: 1.5, 2: 1.25})
+        self.assertEqual(hist.Total(), 2.75)
+        other.Merge(thinkbayes.StreamingHist())
+        self.assertEqual(other.GetDict(), {2: 0.25})
+
+        self.assertRaises(ValueError, hist.Merge,
+                          thinkbayes.StreamingHist(width=0.03, origin=0))
+        self.assertRaises(ValueError, thinkbayes.StreamingHist, max_bins=1)
+
+    def test_quantile_sketch(self):
+        rng = numpy.random.RandomState(1)
+        xs = rng.exponential(1, 100000)
+        k = 100
+
+        # count on four "workers" and merge the sketches
+        sketches = []
+        for i, chunk in enumerate(numpy.array_split(xs, 4)):
+            sketch = thinkbayes.QuantileSketch(k, seed=i)
+            sketch.IncrArray(chunk[:20000])
+            for x in chunk[20000:]:
+                sketch.Incr(x)
+            sketches.append(sketch)
+        sketch = sketches[0]
+        for other in sketches[1:]:
+            sketch.Merge(other)
+        self.assertEqual(sketch.Total(), len(xs))
+        self.assertTrue(sketch.NumRetained() < 4 * k)
+
+        cdf = sketch.MakeCdf()
+        self.assertEqual(cdf.ps[-1], 1)
+        true = numpy.searchsorted(numpy.sort(xs), cdf.xs, 'right')
+        self.assertTrue(numpy.abs(true / float(len(xs)) - cdf.ps).max() <
+                        1.7 / k)
+
+        # counts are split into powers of two
+        sketch = thinkbayes.QuantileSketch(k)
+        sketch.Incr(3, 5)
+        sketch.Incr(1, 3)
+        cdf = sketch.MakeCdf('counts')
+        self.assertEqual(cdf.name, 'counts')
+        self.assertEqual(cdf.Items(), [(1, 3 / 8.0), (3, 1)])
+        self.assertEqual(thinkbayes.QuantileSketch().MakeCdf().xs, [])
+        for term in (-1, 0.5, 2.0, '3'):
+            self.assertRaises(ValueError, sketch.Incr, 1, term)
+        sketch.Incr(5, numpy.int64(4))
+        sketch.Incr(5, 0)
+        self.assertEqual(sketch.Total(), 12)
+
+
+if __name__ == "__main__":
+    unittest.main()